@@ -1,158 +1,91 @@
 """main app"""
 
+import atexit
+from json import dumps
 from sqlite3 import Error
-from json import dumps, JSONDecodeError
-from flask import Flask, Response
-from selenium.common.exceptions import WebDriverException
-from scraper.scraper import FootballScraper
-from cleaned_data.cleaner import Preprocessing
-from database.service import DatabaseManager
-from config import DB_PATH, API_BP
-
-app = Flask(__name__)
-scraper = FootballScraper()
-db_manager = DatabaseManager()
-
-@API_BP.route("/scrape-and-save", methods=["GET"])
-def scrape_and_save():
-    """scraping and save the data"""
-    try:
-        raw_data = scraper.start()
+from threading import Lock
+from typing import TYPE_CHECKING
+from flask import Response, request
+from database.model import create_all_table
+from read_api import create_app, db_manager
+from config import DB_PATH, API_BP, SCHEDULER_ENABLED
 
-        clean_data = Preprocessing(raw_data)
+if TYPE_CHECKING:
+    from jobs.manager import JobManager
 
-        db_manager.insert_data(
-            DB_PATH,
-            clean_data.results,
-            clean_data.fixtures,
-            clean_data.standings
-        )
+create_all_table(DB_PATH)
+db_manager.materialize_views(DB_PATH)
 
-        return dumps({"message": "Data scraped and saved successfully!"})
+_job_manager: "JobManager | None" = None
+_job_manager_lock = Lock()
 
-    except WebDriverException as e:
-        return dumps({"error": str(e)}, indent=2), 500
-    except Error as e:
-        return dumps({"error": str(e)}, indent=2), 500
-    except KeyboardInterrupt as e:
-        return dumps({"error": str(e)}, indent=2), 500
-    except JSONDecodeError as e:
-        return dumps({"error": str(e)}, indent=2), 500
+def job_manager() -> "JobManager":
+    """the job manager, importing the scraper and cleaning stack on first use"""
+    global _job_manager
 
-@API_BP.route("/<league_name>/teams", methods=["GET"])
-def get_teams_data(league_name: str):
-    """get teams data"""
-    try:
-        teams = [
-            {"id": data[2], "name": data[1]} for data in db_manager.get_teams(league_name, DB_PATH)
-        ]
+    with _job_manager_lock:
+        if _job_manager is None:
+            from scraper.scraper import FootballScraper
+            from jobs.manager import JobManager
 
-        data = {
-            "league": league_name,
-            "teams": teams
-        }
+            scraper = FootballScraper()
+            _job_manager = JobManager(scraper, db_manager)
+            atexit.register(scraper.close)
+            atexit.register(_job_manager.shutdown)
+
+        return _job_manager
+
+if SCHEDULER_ENABLED:
+    from jobs.scheduler import RefreshScheduler
+
+    scheduler = RefreshScheduler(job_manager(), db_manager)
+    scheduler.start()
+    atexit.register(scheduler.stop)
+
+@API_BP.route("/scrape-and-save", methods=["GET", "POST"])
+def scrape_and_save():
+    """
+    start a background scrape job, only new matches with ?mode=incremental
+    and only some leagues with ?leagues=premier-league,serie-a
+    """
+    # the job stack pulls in selenium, so it is only imported once a scrape is asked for
+    from jobs.manager import JobConflict
+
+    leagues = request.args.get("leagues")
 
-        response_data = dumps(data, indent=2)
-    except Error as e:
-        response_data = dumps({"error": str(e)}, indent=2)
-    except JSONDecodeError as e:
-        response_data = dumps({"error": str(e)}, indent=2)
-    return Response(response_data, mimetype="application/json")
-
-@API_BP.route("/<league_name>/results", methods=["GET"])
-def get_results_data(league_name: str):
-    """get results data"""
-    try:
-        results = []
-        for data in db_manager.get_results(league_name, DB_PATH):
-            record = {
-                "id": data[0],
-                "date": data[1],
-                "time": data[2],
-                "home": data[3],
-                "away": data[4],
-                "home_score": data[5],
-                "away_score": data[6]
-            }
-
-            results.append(record)
-
-        data = {
-            "league": league_name,
-            "results": results
-        }
-
-        response_data = dumps(data, indent=2)
-    except Error as e:
-        response_data = dumps({"error": str(e)})
-    except JSONDecodeError as e:
-        response_data = dumps({"error": str(e)})
-    return Response(response_data, mimetype="application/json")
-
-@API_BP.route("/<league_name>/fixtures", methods=["GET"])
-def get_fixtures_data(league_name: str):
-    """get fixtures data"""
-    try:
-        fixtures = []
-        for data in db_manager.get_fixtures(league_name, DB_PATH):
-            record = {
-                "id": data[0],
-                "date": data[1],
-                "time": data[2],
-                "match_status": data[3],
-                "home": data[4],
-                "away": data[5]
-            }
-
-            fixtures.append(record)
-
-        data = {
-            "league": league_name,
-            "fixtures": fixtures
-        }
-
-        response_data = dumps(data, indent=2)
-    except Error as e:
-        response_data = dumps({"error": str(e)})
-    except JSONDecodeError as e:
-        response_data = dumps({"error": str(e)})
-    return Response(response_data, mimetype="application/json")
-
-@API_BP.route("/<league_name>/standings", methods=["GET"])
-def get_standings_data(league_name: str):
-    """get standings data"""
     try:
-        standings = []
-        position = 1
-        for data in db_manager.get_standings(league_name, DB_PATH):
-            record = {
-                "id": data[0],
-                "team": data[1],
-                "match_played": data[2],
-                "won": data[3],
-                "drawn": data[4],
-                "loses": data[5],
-                "goals_for": data[6],
-                "goals_against": data[7],
-                "goals_difference": data[8],
-                "points": data[9],
-                "position": position
-            }
-
-            position += 1
-
-            standings.append(record)
-
-        data = {
-            "league": league_name,
-            "standings": standings
-        }
-
-        response_data = dumps(data, indent=2)
+        job = job_manager().submit(
+            incremental=request.args.get("mode") == "incremental",
+            leagues=leagues.replace("-", " ").split(",") if leagues else None
+        )
+    except JobConflict as e:
+        return dumps({"error": str(e), "job_id": e.job_id}, indent=2), 409
+    except ValueError as e:
+        return dumps({"error": str(e)}, indent=2), 400
     except Error as e:
-        response_data = dumps({"error": str(e)})
-    except JSONDecodeError as e:
-        response_data = dumps({"error": str(e)})
-    return Response(response_data, mimetype="application/json")
+        return dumps({"error": str(e)}, indent=2), 500
+
+    response_data = dumps(
+        {"job_id": job["id"], "status": job["status"], "status_url": f"/api/jobs/{job['id']}"},
+        indent=2
+    )
+    return Response(response_data, status=202, mimetype="application/json")
+
+@API_BP.route("/jobs/<job_id>", methods=["GET"])
+def get_job(job_id: str):
+    """get a scrape job's progress, from whichever api process runs it"""
+    if _job_manager is not None:
+        job = _job_manager.get(job_id)
+    else:
+        job = db_manager.get_job(DB_PATH, job_id)
+
+    if job is None:
+        return Response(
+            dumps({"error": f"Job {job_id} not found."}, indent=2),
+            status=404,
+            mimetype="application/json"
+        )
+
+    return Response(dumps(job, indent=2), mimetype="application/json")
 
-app.register_blueprint(API_BP)
+app = create_app()
@@ -0,0 +1,56 @@
+"""response cache backends"""
+from collections import OrderedDict
+from threading import Lock
+from typing import Protocol
+from config import CACHE_MAX_ENTRIES, CACHE_TTL
+
+class CacheBackend(Protocol):
+    """storage of serialized responses by key"""
+
+    def get(self, key: str) -> bytes | None:
+        """get a stored entry"""
+
+    def set(self, key: str, value: bytes) -> None:
+        """store an entry"""
+
+class LRUBackend:
+    """in-process cache that evicts the least recently used entries"""
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES) -> None:
+        self.__max_entries = max_entries
+        self.__entries: OrderedDict[str, bytes] = OrderedDict()
+        self.__lock = Lock()
+
+    def get(self, key: str) -> bytes | None:
+        """get an entry and mark it as recently used"""
+        with self.__lock:
+            value = self.__entries.get(key)
+            if value is not None:
+                self.__entries.move_to_end(key)
+
+            return value
+
+    def set(self, key: str, value: bytes) -> None:
+        """store an entry, evicting the oldest ones past max_entries"""
+        with self.__lock:
+            self.__entries[key] = value
+            self.__entries.move_to_end(key)
+
+            while len(self.__entries) > self.__max_entries:
+                self.__entries.popitem(last=False)
+
+class RedisBackend:
+    """cache shared by every api process, on a redis client"""
+
+    def __init__(self, client, ttl: int = CACHE_TTL, prefix: str = "football-api:") -> None:
+        self.__client = client
+        self.__ttl = ttl
+        self.__prefix = prefix
+
+    def get(self, key: str) -> bytes | None:
+        """get an entry"""
+        return self.__client.get(self.__prefix + key)
+
+    def set(self, key: str, value: bytes) -> None:
+        """store an entry that expires after ttl seconds"""
+        self.__client.set(self.__prefix + key, value, ex=self.__ttl)
@@ -0,0 +1,59 @@
+"""response cache"""
+from functools import wraps
+from hashlib import sha1
+from typing import Callable
+from urllib.parse import urlencode
+from flask import Response, make_response, request
+from cache.backends import CacheBackend, LRUBackend
+from database.service import DatabaseManager
+from config import DB_PATH
+
+class ResponseCache:
+    """
+    serialized responses keyed by path, query and the database's data version,
+    so a commit that changes the data makes every older entry unreachable
+    """
+
+    def __init__(
+        self,
+        db_manager: DatabaseManager,
+        db: str = DB_PATH,
+        backend: CacheBackend | None = None
+    ) -> None:
+        self.__db_manager = db_manager
+        self.__db = db
+        self.__backend = backend or LRUBackend()
+
+    def __key(self, version: int) -> str:
+        query = urlencode(sorted(request.args.items(multi=True)))
+        return f"{version}:{request.path}?{query}"
+
+    def cached(self, view: Callable) -> Callable:
+        """serve a view from the cache, with an etag and 304 for a matching If-None-Match"""
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            version = self.__db_manager.get_data_version(self.__db)
+            key = self.__key(version)
+            entry = self.__backend.get(key)
+
+            if entry is None:
+                response = make_response(view(*args, **kwargs))
+                if (
+                    response.status_code != 200
+                    or response.cache_control.no_store
+                    or response.is_streamed
+                ):
+                    return response
+
+                body = response.get_data()
+                etag = f"{version}-{sha1(body).hexdigest()[:16]}"
+                self.__backend.set(key, etag.encode() + b"\n" + body)
+            else:
+                etag, body = entry.split(b"\n", 1)
+                etag = etag.decode()
+
+            response = Response(body, mimetype="application/json")
+            response.set_etag(etag)
+            return response.make_conditional(request)
+
+        return wrapper
@@ -0,0 +1,80 @@
+"""time preprocessing on synthetic multi-league, multi-season pages"""
+from argparse import ArgumentParser
+from itertools import cycle, islice
+from random import Random
+from time import perf_counter
+from cleaned_data.cleaner import Preprocessing
+from cleaned_data.records import RecordPreprocessing
+
+def _page(
+    league: str, name: str, season: str, kind: str, rows: int, teams: int, rng: Random
+) -> dict:
+    """one scraped page of a league named name, in the shape the scraper yields"""
+    dates = islice(cycle(f"{day:02}.{month:02}." for month in range(1, 13) for day in range(1, 29)), rows)
+    times = [f"{rng.choice((15, 17, 20))}:{rng.choice(('00', '30'))}" for _ in range(rows)]
+    pairs = [rng.sample(range(teams), 2) for _ in range(rows)]
+    played = kind == "results"
+
+    return {
+        "league": league,
+        "kind": kind,
+        "error": None,
+        "data": {
+            "league": [name],
+            "season": [season] * rows,
+            "schedules": [f"{date} {time}" for date, time in zip(dates, times)],
+            "match_status": ["not_postponed"] * rows,
+            "home": [f"team {home}" for home, _ in pairs],
+            "away": [f"team {away}" for _, away in pairs],
+            "home_scores": [str(rng.randint(0, 5)) if played else "" for _ in range(rows)],
+            "away_scores": [str(rng.randint(0, 5)) if played else "" for _ in range(rows)],
+        },
+    }
+
+def synthetic_records(leagues: int, seasons: int, matches: int, teams: int = 20) -> list[dict]:
+    """results and fixtures pages of every league and season, with matches rows each"""
+    rng = Random(0)
+    records = []
+
+    for league in range(leagues):
+        for year in range(2000, 2000 + seasons):
+            season = f"{year}/{year + 1}"
+            for kind in ("results", "fixtures"):
+                records.append(
+                    _page(f"league {league} {season}", f"league {league}", season, kind, matches, teams, rng)
+                )
+
+    return records
+
+def main():
+    """print the best of repeat runs and its cost per row"""
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument("--leagues", type=int, default=30)
+    parser.add_argument("--seasons", type=int, default=3)
+    parser.add_argument("--matches", type=int, default=380, help="rows per page")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--standings", action="store_true", help="also build the pandas standings"
+    )
+    parser.add_argument(
+        "--records", action="store_true", help="clean into records instead of DataFrames"
+    )
+    args = parser.parse_args()
+
+    records = synthetic_records(args.leagues, args.seasons, args.matches)
+    rows = sum(len(record["data"]["schedules"]) for record in records)
+
+    timings = []
+    for _ in range(args.repeat):
+        start = perf_counter()
+        clean_data = (RecordPreprocessing if args.records else Preprocessing)(records)
+        if args.standings and not args.records:
+            clean_data.standings
+        timings.append(perf_counter() - start)
+
+    best = min(timings)
+    print(f"pages: {len(records)}, rows: {rows}")
+    print(f"preprocessing: {best:.3f}s, {best / rows * 1e6:.1f}us per row")
+
+if __name__ == "__main__":
+    main()
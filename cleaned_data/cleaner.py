@@ -1,56 +1,151 @@
 '''module automate preprocessing'''
 
-from datetime import datetime
+from datetime import datetime, timedelta
+from typing import Iterable, Iterator
 import pandas as pd
 import numpy as np
-from config import URLS
+from cleaned_data.pages import (
+    FIXTURE_COLUMNS,
+    RESULT_COLUMNS,
+    fixtures_hash,
+    page_rows,
+    pair_pages,
+    per_league
+)
+from scraper.parser import FIXTURE_ROLLOVER_DAYS
+
+def _concat(dfs: Iterable[pd.DataFrame]) -> pd.DataFrame:
+    """concat every frame at once, or an empty frame when there are none"""
+    dfs = list(dfs)
+    return pd.concat(dfs, ignore_index=True) if dfs else pd.DataFrame()
 
 class Preprocessing:
     """automate preprocessing class"""
 
-    def __init__(self, raw_data: list[dict[str, list[str]]]) -> None:
-        self.__bound = int(len(URLS) / 2)
-        self.__raw_data = raw_data
-        self.__results_df = self.__create_results_df()
-        self.__fixtures_df = self.__create_fixtures_df()
-
-        self.__results_df = self.__format_data(self.__results_df)
-        self.__fixtures_df = self.__format_data(self.__fixtures_df)
-
-        self.__standings_df = self.__create_standings_df(
-            self.__results_df, self.__fixtures_df
+    def __init__(
+        self,
+        records: Iterable[dict],
+        scrape_state: dict[str, tuple[str | None, str | None]] | None = None
+    ) -> None:
+        self.__failed = {}
+        self.__leagues = []
+        self.__results_df, self.__fixtures_df = self.__create_dfs(records)
+
+        if self.__leagues:
+            self.__results_df = self.__convert_score_types(
+                self.__format_schedules(self.__results_df, is_results=True)
+            )
+            self.__fixtures_df = self.__format_schedules(self.__fixtures_df, is_results=False)
+
+        self.__scrape_state = self.__create_scrape_state()
+        if scrape_state and self.__leagues:
+            self.__keep_delta(scrape_state)
+
+        # every frame is indexed by its league until here, to split the standings by league
+        self.__league_dfs = (self.__results_df, self.__fixtures_df)
+        self.__standings_df = None
+
+        self.__results_df = self.__results_df.reset_index(drop=True)
+        self.__fixtures_df = self.__fixtures_df.reset_index(drop=True)
+
+    @classmethod
+    def per_league(
+        cls,
+        records: Iterable[dict],
+        scrape_state: dict[str, tuple[str | None, str | None]] | None = None
+    ) -> Iterator["Preprocessing"]:
+        """clean each league as soon as both of its pages (or a failure) have arrived"""
+        for pages in per_league(records):
+            yield cls(pages, scrape_state)
+
+    def __create_dfs(self, records: Iterable[dict]) -> tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        pair every league's results and fixtures pages, in whatever order they come,
+        and build one results and one fixtures frame of every league's rows
+        """
+        pages, self.__failed = pair_pages(records)
+
+        results = {column: [] for column in RESULT_COLUMNS}
+        fixtures = {column: [] for column in FIXTURE_COLUMNS}
+        results_index = []
+        fixtures_index = []
+
+        for league, kinds in pages.items():
+            result_rows = page_rows(kinds["results"], RESULT_COLUMNS)
+            fixture_rows = page_rows(kinds["fixtures"], FIXTURE_COLUMNS)
+            if result_rows is None or fixture_rows is None:
+                self.__failed[league] = "page columns of different lengths"
+                continue
+
+            self.__leagues.append(league)
+            self.__extend_columns(results, kinds["results"], result_rows)
+            self.__extend_columns(fixtures, kinds["fixtures"], fixture_rows)
+            results_index += [league] * result_rows
+            fixtures_index += [league] * fixture_rows
+
+        if not self.__leagues:
+            return pd.DataFrame(), pd.DataFrame()
+
+        return (
+            pd.DataFrame(results, index=pd.Index(results_index)),
+            pd.DataFrame(fixtures, index=pd.Index(fixtures_index)),
         )
 
-        self.__results_df, self.__fixtures_df, self.__standings_df = self.__concate_df()
-
-    def __create_results_df(self) -> dict[str, pd.DataFrame]:
-        results_df = {}
-
-        for _ in range(self.__bound):
-            result_data = next(self.__raw_data)
-            result_data.pop("match_status")
+    def __extend_columns(
+        self, columns: dict[str, list[str]], data: dict[str, list[str]], rows: int
+    ) -> None:
+        for column, values in columns.items():
+            values += data[column] * rows if column == "league" else data[column]
 
-            league_name = result_data["league"][0]
-            result_data["league"] *= len(result_data["season"])
+    def __create_scrape_state(self) -> dict[str, tuple[str | None, str]]:
+        """latest result date and fixture set hash of every scraped league"""
+        if not self.__leagues:
+            return {}
 
-            results_df[league_name] = pd.DataFrame(result_data)
+        last_result_dates = self.__results_df["date"].groupby(level=0, sort=False).max()
 
-        return results_df
-
-    def __create_fixtures_df(self) -> dict[str, pd.DataFrame]:
-        fixtures_df = {}
-
-        for _ in range(self.__bound):
-            fixture_data = next(self.__raw_data)
-            fixture_data.pop("home_scores")
-            fixture_data.pop("away_scores")
+        fixture_rows = {league: [] for league in self.__leagues}
+        for league, *row in zip(
+            self.__fixtures_df.index, self.__fixtures_df["date"], self.__fixtures_df["time"],
+            self.__fixtures_df["match_status"], self.__fixtures_df["home"],
+            self.__fixtures_df["away"]
+        ):
+            fixture_rows[league].append(tuple(row))
 
-            league_name = fixture_data["league"][0]
-            fixture_data["league"] *= len(fixture_data["season"])
+        return {
+            league: (
+                last_result_dates.get(league),
+                fixtures_hash(fixture_rows[league]),
+            )
+            for league in self.__leagues
+        }
+
+    def __keep_delta(self, scrape_state: dict[str, tuple[str | None, str | None]]) -> None:
+        """drop results older than the league's last saved result and unchanged fixtures"""
+        last_result_dates = {
+            league: last_result_date
+            for league, (last_result_date, _) in scrape_state.items()
+            if last_result_date is not None
+        }
+        # leagues without a saved result keep every result, as "" sorts before any date
+        since = self.__results_df.index.map(lambda league: last_result_dates.get(league, ""))
+        self.__results_df = self.__results_df.loc[
+            self.__results_df["date"].to_numpy() >= since.to_numpy()
+        ]
 
-            fixtures_df[league_name] = pd.DataFrame(fixture_data)
+        unchanged = [
+            league for league, (_, fixtures_hash) in scrape_state.items()
+            if league in self.__scrape_state and fixtures_hash == self.__scrape_state[league][1]
+        ]
+        self.__fixtures_df = self.__fixtures_df.loc[~self.__fixtures_df.index.isin(unchanged)]
 
-        return fixtures_df
+    def __split_by_league(self, df: pd.DataFrame) -> dict[str, pd.DataFrame]:
+        """every league's rows of a frame indexed by league, empty for leagues without rows"""
+        leagues = {league: rows for league, rows in df.groupby(level=0, sort=False)}
+        return {
+            league: leagues.get(league, df.iloc[0:0]).reset_index(drop=True)
+            for league in self.__leagues
+        }
 
     def __create_standings_df(
         self, results_df: dict[str, pd.DataFrame], fixtures_df: dict[str, pd.DataFrame]
@@ -59,7 +154,7 @@ class Preprocessing:
 
         for key in results_df.keys():
             df[key] = pd.DataFrame(
-                columns=["league", "team", "MP", "W", "D", "L", "GF", "GA", "GD", "PTS"]
+                columns=["league", "season", "team", "MP", "W", "D", "L", "GF", "GA", "GD", "PTS"]
             )
 
             df[key] = self.__add_all_teams_and_league(
@@ -76,22 +171,6 @@ class Preprocessing:
 
         return df
 
-    def __concate_df(self) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
-        results = pd.DataFrame()
-        fixtures = pd.DataFrame()
-        standings = pd.DataFrame()
-
-        for result, fixture, standing in zip(
-            self.__results_df.values(),
-            self.__fixtures_df.values(),
-            self.__standings_df.values(),
-        ):
-            results = pd.concat([results, result], ignore_index=True)
-            fixtures = pd.concat([fixtures, fixture], ignore_index=True)
-            standings = pd.concat([standings, standing], ignore_index=True)
-
-        return results, fixtures, standings
-
     def __calculate_match_played(self, df: pd.DataFrame) -> pd.DataFrame:
         df["MP"] = df["W"] + df["D"] + df["L"]
         return df
@@ -178,56 +257,65 @@ class Preprocessing:
 
         df.loc[:, "team"] = all_teams
 
-        league = list(results_df["league"].unique())
+        league = list(
+            pd.concat([results_df["league"], fixtures_df["league"]]).unique()
+        )
         df["league"] = league * len(all_teams)
+
+        season_df = fixtures_df if results_df.empty else results_df
+        df["season"] = list(season_df["season"].unique()[:1]) * len(all_teams)
         return df
 
     def __format_schedules(self, df: pd.DataFrame, is_results: bool) -> pd.DataFrame:
-        """to formatting Schedules"""
-        schedules = [schedule.split(" ") for schedule in df["schedules"]]
+        """
+        to formatting Schedules, dropping rows whose schedule names no day,
+        such as those the parser found no time in
+        """
+        schedules = df["schedules"].astype("str").str.extract(
+            r"^(?P<day>\d+)\.(?P<month>\d+)\.?(?:.* )?(?P<time>[^ ]*)$"
+        )
+        # an unparsed day or month of 0 makes no date, and the row is dropped below
+        day = schedules["day"].fillna("0").astype("int64").to_numpy()
+        month = schedules["month"].fillna("0").astype("int64").to_numpy()
 
         current_date = datetime.now()
-        current_year = current_date.year
-
-        for schedule in schedules:
-            schedule[0] = schedule[0].removesuffix(".")
-
-            day, month = map(int, schedule[0].split("."))
+        year = np.full(len(df), current_date.year)
 
-            date = datetime(current_year, month, day)
-
-            if is_results and date > current_date:
-                year = current_year - 1
-                date = datetime(year, month, day)
-                schedule[0] = date
-            else:
-                schedule[0] = date
-
-            schedule[0] = schedule[0].strftime("%d-%m-%Y")
+        if is_results:
+            # results dated after today were played last year
+            is_future = (month > current_date.month) | (
+                (month == current_date.month) & (day > current_date.day)
+            )
+            year -= is_future
+        else:
+            # fixtures more than half a year ago are next year's, postponed ones keep their date
+            this_year = pd.to_datetime(
+                pd.DataFrame({"year": year, "month": month, "day": day}), errors="coerce"
+            ).to_numpy()
+            cutoff = np.datetime64(current_date.date() - timedelta(days=FIXTURE_ROLLOVER_DAYS))
+            year += (this_year < cutoff) & (df["match_status"] != "postponed").to_numpy()
+
+        date = pd.to_datetime(
+            pd.DataFrame({"year": year, "month": month, "day": day}), errors="coerce"
+        )
 
-        date = [schedule[0] for schedule in schedules]
-        time = [schedule[-1] for schedule in schedules]
+        df = df.drop(columns=["schedules"])
+        df["date"] = date.dt.strftime("%Y-%m-%d").to_numpy()
+        df["time"] = schedules["time"].to_numpy()
 
-        df.drop(columns=["schedules"], inplace=True)
-        df["date"] = date
-        df["time"] = time
-
-        return df
+        return df.loc[date.notna().to_numpy()]
 
     def __convert_score_types(self, df: pd.DataFrame) -> pd.DataFrame:
-        if "home_scores" in df.columns:
-            df["home_scores"] = df["home_scores"].apply(int)
-            df["away_scores"] = df["away_scores"].apply(int)
+        """drop results without a score, such as abandoned or postponed matches"""
+        home_scores = pd.to_numeric(df["home_scores"], errors="coerce").to_numpy()
+        away_scores = pd.to_numeric(df["away_scores"], errors="coerce").to_numpy()
+        played = ~(np.isnan(home_scores) | np.isnan(away_scores))
+
+        df = df.loc[played]
+        df["home_scores"] = home_scores[played].astype("int64")
+        df["away_scores"] = away_scores[played].astype("int64")
         return df
 
-    def __format_data(self, dfs: dict[pd.DataFrame]) -> dict[str, pd.DataFrame]:
-        for df in dfs.values():
-            is_results = "match_status" not in df.columns
-            df = self.__format_schedules(df, is_results)
-            df = self.__convert_score_types(df)
-
-        return dfs
-
     @property
     def results(self) -> pd.DataFrame:
         """to return result df"""
@@ -240,5 +328,23 @@ class Preprocessing:
 
     @property
     def standings(self) -> pd.DataFrame:
-        """return standings df"""
+        """
+        return standings df, computed from the cleaned results on first use. the
+        database keeps its own standings up to date from the results it stores
+        """
+        if self.__standings_df is None:
+            results, fixtures = (self.__split_by_league(df) for df in self.__league_dfs)
+            standings = self.__create_standings_df(results, fixtures)
+            self.__standings_df = _concat(standings.values())
+
         return self.__standings_df
+
+    @property
+    def failed(self) -> dict[str, str]:
+        """return the error of every league that could not be cleaned"""
+        return self.__failed
+
+    @property
+    def scrape_state(self) -> dict[str, tuple[str | None, str]]:
+        """return each league's latest result date and fixtures hash"""
+        return self.__scrape_state
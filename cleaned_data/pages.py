@@ -0,0 +1,63 @@
+"""pairing of scraped pages by league, shared by both preprocessing paths"""
+from hashlib import sha1
+from typing import Iterable, Iterator
+
+RESULT_COLUMNS = ["league", "season", "schedules", "home", "away", "home_scores", "away_scores"]
+FIXTURE_COLUMNS = ["league", "season", "schedules", "match_status", "home", "away"]
+
+def per_league(records: Iterable[dict]) -> Iterator[list[dict]]:
+    """group the records of each league as soon as both of its pages (or a failure) have arrived"""
+    pending = {}
+    done = set()
+
+    for record in records:
+        league = record["league"]
+        if league in done:
+            continue
+
+        pages = pending.setdefault(league, [])
+        pages.append(record)
+
+        if record["error"] is not None or len(pages) == 2:
+            done.add(league)
+            yield pending.pop(league)
+
+    yield from pending.values()
+
+def pair_pages(records: Iterable[dict]) -> tuple[dict[str, dict[str, dict]], dict[str, str]]:
+    """every league's results and fixtures data, in whatever order they come, and the error of every other league"""
+    pages = {}
+    failed = {}
+
+    for record in records:
+        if record["error"] is not None:
+            failed[record["league"]] = record["error"]
+        else:
+            pages.setdefault(record["league"], {})[record["kind"]] = record["data"]
+
+    paired = {}
+    for league, kinds in pages.items():
+        if league in failed:
+            continue
+
+        missing = {"results", "fixtures"} - kinds.keys()
+        if missing:
+            failed[league] = f"missing {missing.pop()} page"
+        else:
+            paired[league] = kinds
+
+    return paired, failed
+
+def page_rows(data: dict[str, list[str]], columns: list[str]) -> int | None:
+    """number of rows of a page, or None when its columns differ in length"""
+    rows = len(data["season"])
+    lengths = {len(data[column]) for column in columns if column != "league"}
+
+    if lengths != {rows} or (rows and len(data["league"]) != 1):
+        return None
+
+    return rows
+
+def fixtures_hash(rows: Iterable[tuple[str, str, str, str, str]]) -> str:
+    """hash of a league's set of (date, time, match_status, home, away) fixtures"""
+    return sha1(repr(sorted(rows)).encode()).hexdigest()
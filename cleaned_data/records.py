@@ -0,0 +1,172 @@
+"""compact match records, cleaned without pandas for small incremental deltas"""
+from dataclasses import dataclass
+from typing import Iterable, Iterator
+from cleaned_data.pages import (
+    FIXTURE_COLUMNS,
+    RESULT_COLUMNS,
+    fixtures_hash,
+    page_rows,
+    pair_pages,
+    per_league
+)
+from scraper.parser import schedule_date
+
+@dataclass(slots=True)
+class Result:
+    """a played match"""
+    league: str
+    season: str
+    date: str
+    time: str
+    home: str
+    away: str
+    home_score: int
+    away_score: int
+
+@dataclass(slots=True)
+class Fixture:
+    """an upcoming match"""
+    league: str
+    season: str
+    date: str
+    time: str
+    match_status: str
+    home: str
+    away: str
+
+def _schedule(schedule: str, is_results: bool, postponed: bool = False) -> tuple[str, str] | None:
+    """iso date and time of a "dd.mm. HH:MM" schedule, None when it names no day"""
+    try:
+        match_date = schedule_date(schedule, is_results, postponed=postponed)
+    except ValueError:
+        return None
+
+    return match_date.isoformat(), schedule.rsplit(" ", 1)[1] if " " in schedule else ""
+
+def _score(score: str) -> int | None:
+    return int(score) if score.strip().isdigit() else None
+
+class RecordPreprocessing:
+    """
+    the same cleaning as Preprocessing into lists of records, for refreshes
+    that bring a few dozen new matches and are not worth a DataFrame
+    """
+
+    def __init__(
+        self,
+        records: Iterable[dict],
+        scrape_state: dict[str, tuple[str | None, str | None]] | None = None
+    ) -> None:
+        self.__results: list[Result] = []
+        self.__fixtures: list[Fixture] = []
+        self.__scrape_state = {}
+
+        pages, self.__failed = pair_pages(records)
+
+        for league, kinds in pages.items():
+            if (
+                page_rows(kinds["results"], RESULT_COLUMNS) is None
+                or page_rows(kinds["fixtures"], FIXTURE_COLUMNS) is None
+            ):
+                self.__failed[league] = "page columns of different lengths"
+                continue
+
+            results = self.__create_results(kinds["results"])
+            fixtures = self.__create_fixtures(kinds["fixtures"])
+
+            self.__scrape_state[league] = (
+                max((result.date for result in results), default=None),
+                fixtures_hash(
+                    (fixture.date, fixture.time, fixture.match_status, fixture.home, fixture.away)
+                    for fixture in fixtures
+                ),
+            )
+
+            if scrape_state and league in scrape_state:
+                results, fixtures = self.__keep_delta(league, results, fixtures, scrape_state[league])
+
+            self.__results += results
+            self.__fixtures += fixtures
+
+    @classmethod
+    def per_league(
+        cls,
+        records: Iterable[dict],
+        scrape_state: dict[str, tuple[str | None, str | None]] | None = None
+    ) -> Iterator["RecordPreprocessing"]:
+        """clean each league as soon as both of its pages (or a failure) have arrived"""
+        for pages in per_league(records):
+            yield cls(pages, scrape_state)
+
+    def __create_results(self, data: dict[str, list[str]]) -> list[Result]:
+        """
+        results of a page, without those that have no score such as abandoned
+        matches or no schedule the parser could read
+        """
+        league = data["league"][0] if data["league"] else None
+        results = []
+
+        for season, schedule, home, away, home_score, away_score in zip(
+            data["season"], data["schedules"], data["home"], data["away"],
+            data["home_scores"], data["away_scores"]
+        ):
+            home_score, away_score = _score(home_score), _score(away_score)
+            schedule = _schedule(schedule, True)
+            if home_score is not None and away_score is not None and schedule is not None:
+                results.append(
+                    Result(league, season, *schedule, home, away, home_score, away_score)
+                )
+
+        return results
+
+    def __create_fixtures(self, data: dict[str, list[str]]) -> list[Fixture]:
+        """fixtures of a page, without those that have no schedule the parser could read"""
+        league = data["league"][0] if data["league"] else None
+        fixtures = []
+
+        for season, schedule, match_status, home, away in zip(
+            data["season"], data["schedules"], data["match_status"], data["home"], data["away"]
+        ):
+            schedule = _schedule(schedule, False, match_status == "postponed")
+            if schedule is not None:
+                fixtures.append(Fixture(league, season, *schedule, match_status, home, away))
+
+        return fixtures
+
+    def __keep_delta(
+        self,
+        league: str,
+        results: list[Result],
+        fixtures: list[Fixture],
+        state: tuple[str | None, str | None]
+    ) -> tuple[list[Result], list[Fixture]]:
+        """drop results older than the league's last saved result and unchanged fixtures"""
+        last_result_date, saved_fixtures_hash = state
+
+        if last_result_date is not None:
+            results = [result for result in results if result.date >= last_result_date]
+
+        if saved_fixtures_hash == self.__scrape_state[league][1]:
+            fixtures = []
+
+        return results, fixtures
+
+    @property
+    def results(self) -> list[Result]:
+        """return the result records"""
+        return self.__results
+
+    @property
+    def fixtures(self) -> list[Fixture]:
+        """return the fixture records"""
+        return self.__fixtures
+
+    @property
+    def failed(self) -> dict[str, str]:
+        """return the error of every league that could not be cleaned"""
+        return self.__failed
+
+    @property
+    def scrape_state(self) -> dict[str, tuple[str | None, str]]:
+        """return each league's latest result date and fixtures hash"""
+        return self.__scrape_state
@@ -5,6 +5,21 @@ from flask import Blueprint
 DB_NAME = 'football.db'
 FOLDER_PATH = Path('database')
 DB_PATH = FOLDER_PATH / DB_NAME
+SNAPSHOT_PATH = Path('snapshots')
+
+DB_POOL_SIZE = 8
+DB_TIMEOUT = 30
+DB_CACHE_SIZE_KB = 16384
+DB_MMAP_SIZE = 256 * 2**20
+
+FORM_MATCHES = 5
+
+CACHE_MAX_ENTRIES = 256
+CACHE_REDIS_URL = None
+CACHE_TTL = 24 * 3600
+
+JSON_BACKEND = 'json'
+STREAM_BATCH_SIZE = 500
 
 
 API_BP = Blueprint("api", __name__, url_prefix="/api")
@@ -24,6 +39,27 @@ URLS = [
     'https://www.flashscore.com/football/italy/serie-a/fixtures/',
 ]
 
+SCRAPER_BACKEND = 'thread'
+SCRAPER_WORKERS = None
+CHROME_MEMORY_MB = 512
+DRIVER_MAX_USES = 20
+
+PAGE_TIMEOUT = 20
+PAGE_LOAD_TIMEOUT = 30
+URL_TIMEOUT = 180
+SHOW_MORE_GRACE = 1
+POLL_FREQUENCY = 0.2
+
+SCRAPE_LOCK_TIMEOUT = 3600
+JOB_HISTORY = 50
+
+SCHEDULER_ENABLED = False
+SCHEDULER_TICK = 30
+SCHEDULER_STAGGER = 120
+MATCHDAY_INTERVAL = 5 * 60
+IDLE_INTERVAL = 60 * 60
+MATCH_LENGTH = 150 * 60
+
 HEADERS = {
     'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) Chrome/115.0.0.0'
 }
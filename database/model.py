@@ -2,13 +2,16 @@
 model db
 """
 import sqlite3
+from database import standings
 from config import DB_PATH
 
-def create_all_table():
-    """create leagues, teams, fixtures, results, standings"""
-    conn = sqlite3.connect(DB_PATH)
+def create_all_table(db: str = DB_PATH):
+    """create leagues, teams, fixtures, results, standings, scrape_state, scrape_lock"""
+    conn = sqlite3.connect(db)
     cursor = conn.cursor()
 
+    cursor.execute("PRAGMA journal_mode = WAL")
+
     cursor.execute(
         """
         CREATE TABLE IF NOT EXISTS leagues (
@@ -85,6 +88,183 @@ def create_all_table():
         """
     )
 
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS scrape_state (
+            league TEXT PRIMARY KEY,
+            last_result_date TEXT,
+            fixtures_hash TEXT
+        )
+        """
+    )
+
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS scrape_lock (
+            lock_id INTEGER PRIMARY KEY CHECK (lock_id = 1),
+            job_id TEXT NOT NULL,
+            acquired_at TEXT NOT NULL
+        )
+        """
+    )
+
     conn.commit()
+
+    migrate(conn)
+
     cursor.close()
     conn.close()
+
+def add_league_keys(cursor: sqlite3.Cursor):
+    """
+    add league_id to results, fixtures and standings, with covering indexes
+    for the per-league date and standings-order reads
+    """
+    for table, team_column in (
+        ("results", "home_team_id"),
+        ("fixtures", "home_team_id"),
+        ("standings", "team_id"),
+    ):
+        cursor.execute(
+            f"ALTER TABLE {table} ADD COLUMN league_id INTEGER REFERENCES leagues(league_id)"
+        )
+        cursor.execute(
+            f"""
+            UPDATE {table} SET league_id = (
+                SELECT teams.league_id FROM teams WHERE teams.team_id = {table}.{team_column}
+            )
+            """
+        )
+
+    cursor.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_results_league_date ON results (
+            league_id, date, time, home_team_id, away_team_id, home_score, away_score
+        )
+        """
+    )
+
+    cursor.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_fixtures_league_date ON fixtures (
+            league_id, date, time, match_status, home_team_id, away_team_id
+        )
+        """
+    )
+
+    cursor.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_standings_league_order ON standings (
+            league_id, PTS DESC, GD DESC, GF DESC, team_id, MP, W, D, L, GA
+        )
+        """
+    )
+
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_teams_league ON teams (league_id, name)"
+    )
+
+def rebuild_standings(cursor: sqlite3.Cursor):
+    """recompute the standings from the results, the base that result deltas are applied to"""
+    standings.rebuild(cursor)
+
+def add_data_version(cursor: sqlite3.Cursor):
+    """add the counter every commit that changes the served data bumps"""
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS data_version (
+            version_id INTEGER PRIMARY KEY CHECK (version_id = 1),
+            version INTEGER NOT NULL
+        )
+        """
+    )
+
+    cursor.execute("INSERT OR IGNORE INTO data_version (version_id, version) VALUES (1, 0)")
+
+def iso_dates(cursor: sqlite3.Cursor):
+    """
+    store match dates as yyyy-mm-dd instead of dd-mm-yyyy so they sort and
+    compare as text, and add a combined kickoff column with an index
+    """
+    for table in ("results", "fixtures"):
+        cursor.execute(
+            f"""
+            UPDATE {table}
+            SET date = substr(date, 7, 4) || '-' || substr(date, 4, 2) || '-' || substr(date, 1, 2)
+            WHERE date GLOB '[0-9][0-9]-[0-9][0-9]-[0-9][0-9][0-9][0-9]'
+            """
+        )
+
+        cursor.execute(
+            f"""
+            ALTER TABLE {table}
+            ADD COLUMN kickoff TEXT GENERATED ALWAYS AS (date || ' ' || time) VIRTUAL
+            """
+        )
+
+        cursor.execute(
+            f"CREATE INDEX IF NOT EXISTS idx_{table}_kickoff ON {table} (kickoff)"
+        )
+
+def add_materialized_views(cursor: sqlite3.Cursor):
+    """
+    add the served views of every league, serialized when a load commits;
+    DatabaseManager fills them in for the leagues stored before
+    """
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS materialized_views (
+            league_id INTEGER NOT NULL,
+            view_name TEXT NOT NULL,
+            version INTEGER NOT NULL,
+            body TEXT NOT NULL,
+            PRIMARY KEY (league_id, view_name),
+            FOREIGN KEY (league_id) REFERENCES leagues(league_id)
+        ) WITHOUT ROWID
+        """
+    )
+
+def add_scrape_jobs(cursor: sqlite3.Cursor):
+    """add the status of recent scrape jobs, readable by every api process"""
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS scrape_jobs (
+            job_id TEXT PRIMARY KEY,
+            job TEXT NOT NULL
+        )
+        """
+    )
+
+def clear_materialized_views(cursor: sqlite3.Cursor):
+    """
+    drop the materialized views built while teams were listed by name, for
+    DatabaseManager to rebuild them in team_id order
+    """
+    cursor.execute("DELETE FROM materialized_views")
+
+MIGRATIONS = [
+    add_league_keys,
+    rebuild_standings,
+    add_data_version,
+    iso_dates,
+    add_materialized_views,
+    clear_materialized_views,
+    add_scrape_jobs,
+]
+
+def migrate(conn: sqlite3.Connection):
+    """apply the migrations newer than the database's user_version, each in its own transaction"""
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+
+    for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+        cursor = conn.cursor()
+        try:
+            cursor.execute("BEGIN")
+            migration(cursor)
+            cursor.execute(f"PRAGMA user_version = {number}")
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
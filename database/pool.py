@@ -0,0 +1,83 @@
+"""sqlite connection pool"""
+import sqlite3
+from contextlib import contextmanager
+from pathlib import Path
+from queue import Empty, LifoQueue
+from threading import BoundedSemaphore
+from typing import Iterator
+from config import DB_POOL_SIZE, DB_TIMEOUT, DB_CACHE_SIZE_KB, DB_MMAP_SIZE
+
+class ConnectionPool:
+    """thread-safe pool of tuned connections to one database file"""
+
+    def __init__(self, db: str, size: int = DB_POOL_SIZE, read_only: bool = False) -> None:
+        self.__db = db
+        self.__read_only = read_only
+        self.__idle: LifoQueue[sqlite3.Connection] = LifoQueue()
+        self.__slots = BoundedSemaphore(size)
+
+    def __connect(self) -> sqlite3.Connection:
+        """open a connection, read-only ones through a mode=ro uri"""
+        if self.__read_only:
+            uri = f"{Path(self.__db).resolve().as_uri()}?mode=ro"
+            conn = sqlite3.connect(uri, uri=True, timeout=DB_TIMEOUT, check_same_thread=False)
+        else:
+            conn = sqlite3.connect(self.__db, timeout=DB_TIMEOUT, check_same_thread=False)
+
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute(f"PRAGMA cache_size = -{DB_CACHE_SIZE_KB}")
+        conn.execute(f"PRAGMA mmap_size = {DB_MMAP_SIZE}")
+
+        if self.__read_only:
+            conn.execute("PRAGMA query_only = ON")
+
+        return conn
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """
+        borrow a connection, rolling back whatever it left uncommitted, and
+        raise OperationalError when none is returned within DB_TIMEOUT
+        """
+        if not self.__slots.acquire(timeout=DB_TIMEOUT):
+            raise sqlite3.OperationalError(
+                f"no connection to {self.__db} was free within {DB_TIMEOUT}s"
+            )
+
+        try:
+            try:
+                conn = self.__idle.get_nowait()
+            except Empty:
+                conn = self.__connect()
+
+            try:
+                yield conn
+            finally:
+                if conn.in_transaction:
+                    conn.rollback()
+                self.__idle.put(conn)
+        finally:
+            self.__slots.release()
+
+    @contextmanager
+    def unpooled(self) -> Iterator[sqlite3.Connection]:
+        """
+        a connection of its own, tuned like the pooled ones and closed afterwards,
+        for readers that hold it as long as a client takes to read a stream
+        """
+        conn = self.__connect()
+
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def close(self) -> None:
+        """close every idle connection"""
+        while True:
+            try:
+                conn = self.__idle.get_nowait()
+            except Empty:
+                break
+
+            conn.close()
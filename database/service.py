@@ -1,354 +1,1071 @@
 """service db"""
 import sqlite3
+from datetime import datetime, timedelta
+from json import dumps, loads
 from sqlite3 import Error
-import pandas as pd
+from operator import attrgetter
+from threading import Lock
+from typing import TYPE_CHECKING, Iterable, Iterator
+from database import standings
 from database.model import create_all_table
+from database.pool import ConnectionPool
+from serialization import indented, view_records
+from config import (
+    DB_PATH,
+    DB_POOL_SIZE,
+    SCRAPE_LOCK_TIMEOUT,
+    JOB_HISTORY,
+    FORM_MATCHES,
+    STREAM_BATCH_SIZE
+)
 
-class DatabaseManager():
-    """db manager"""
+if TYPE_CHECKING:
+    import pandas as pd
+    from cleaned_data.records import Fixture, Result
 
-    def __init__(self):
-        create_all_table()
+LEAGUE_ID = """(
+    SELECT league_id FROM leagues
+    WHERE name = :league AND (:season IS NULL OR season = :season)
+    ORDER BY season DESC LIMIT 1
+)"""
 
-    def __insert_leagues_data(
-        self,
-        cursor: sqlite3.Cursor,
-        results: pd.DataFrame,
-        fixtures: pd.DataFrame
-    ) -> dict:
-        """insert leagues data"""
+DISPLAY_DATE = "strftime('%d-%m-%Y', {0})"
 
-        leagues = pd.concat(
-            [results["league"], fixtures["league"]], ignore_index=True
-        ).unique()
+LEAGUE_MATCHES = f"""(
+    SELECT *, 1 AS sign
+    FROM results
+    WHERE league_id = {LEAGUE_ID}
+    AND (:date IS NULL OR date <= :date)
+)"""
 
-        season = pd.concat(
-            [results["season"], fixtures["season"]], ignore_index=True
-        ).unique()
+RESULT_FIELDS = {
+    "id": "results.result_id",
+    "date": DISPLAY_DATE.format("results.date"),
+    "time": "results.time",
+    "home": "home.name",
+    "away": "away.name",
+    "home_score": "results.home_score",
+    "away_score": "results.away_score",
+}
 
-        records = []
-        for league in leagues:
+FIXTURE_FIELDS = {
+    "id": "fixtures.fixture_id",
+    "date": DISPLAY_DATE.format("fixtures.date"),
+    "time": "fixtures.time",
+    "match_status": "fixtures.match_status",
+    "home": "home.name",
+    "away": "away.name",
+}
 
-            record = (league, season.item())
+STANDINGS_COLUMNS = """
+    standings.standing_id,
+    teams.name,
+    standings.MP,
+    standings.W,
+    standings.D,
+    standings.L,
+    standings.GF,
+    standings.GA,
+    standings.GD,
+    standings.PTS
+"""
 
-            records.append(record)
+TEAMS_ORDER = "teams.team_id"
 
-        cursor.executemany(
-            "INSERT OR IGNORE INTO leagues (name, season) VALUES (?, ?)", records
-        )
+# every table breaks ties on the team id, stored or computed, live or materialized
+STANDINGS_ORDER = "PTS DESC, GD DESC, GF DESC, teams.team_id"
 
-        query = f"SELECT league_id, name FROM leagues WHERE season = '{season.item()}'"
-        cursor.execute(query)
-        raw_data = cursor.fetchall()
+MATCH_FIELDS = {"results": RESULT_FIELDS, "fixtures": FIXTURE_FIELDS}
 
-        leagues_data = {}
-        for data in raw_data:
-            league = data[1]
-            leagues_data[league] = data[0]
+BATCH_VIEWS = ("standings", "results", "fixtures", "teams")
 
-        return leagues_data
+SCRAPED_COLUMNS = {
+    "results": ["league", "season", "date", "time", "home", "away", "home_score", "away_score"],
+    "fixtures": ["league", "season", "date", "time", "match_status", "home", "away"],
+}
 
+ID_COLUMNS = {
+    "league_id": "leagues.league_id",
+    "home_team_id": "home.team_id",
+    "away_team_id": "away.team_id",
+}
 
-    def __insert_teams_data(
-        self,
-        cursor: sqlite3.Cursor,
-        df: pd.DataFrame,
-        leagues_data: dict,
-    ) -> dict:
-        """insert teams data"""
-        records = []
+def _frame_rows(df: "pd.DataFrame", columns: list[str]) -> Iterable[tuple]:
+    """the rows of some columns of a frame, as tuples of python values"""
+    if df.empty:
+        return []
 
-        for row in df.itertuples():
+    return zip(*(df[column].tolist() for column in columns))
 
-            if row.league in leagues_data.keys():
-                record = (row.team, leagues_data[row.league])
-                records.append(record)
+def _first_seen(key: str, sources: list[str]) -> str:
+    """
+    the distinct key rows of several (key, position) queries, in the order they
+    first appear in the sources and then by position, so that ids are handed out in scraped order
+    """
+    numbered = " UNION ALL ".join(
+        f"SELECT *, {part} AS part FROM ({source})" for part, source in enumerate(sources)
+    )
 
-        cursor.executemany(
-            "INSERT OR IGNORE INTO teams (name, league_id) VALUES (?, ?)", records
+    return f"""
+        SELECT {key} FROM (
+            SELECT *, ROW_NUMBER() OVER (PARTITION BY {key} ORDER BY part, position) AS seen
+            FROM ({numbered})
         )
+        WHERE seen = 1
+        ORDER BY part, position
+    """
 
-        lower = next(iter(leagues_data.values()))
-        upper = leagues_data.popitem()[1]
+class DatabaseManager():
+    """db manager"""
 
-        query = f"SELECT team_id, name FROM teams WHERE league_id BETWEEN {lower} AND {upper}"
+    def __init__(self, db: str = DB_PATH, create_tables: bool = True):
+        self.__pools: dict[tuple[str, bool], ConnectionPool] = {}
+        self.__pools_lock = Lock()
+        if create_tables:
+            create_all_table(db)
+            self.materialize_views(db)
 
-        cursor.execute(query)
-        raw_data = cursor.fetchall()
+    def __pool(self, db: str, read_only: bool) -> ConnectionPool:
+        """the reader or writer pool of a database file"""
+        key = (str(db), read_only)
 
-        teams_data = {}
-        for data in raw_data:
-            team = data[1]
-            team_id = data[0]
-            teams_data[team] = team_id
+        with self.__pools_lock:
+            if key not in self.__pools:
+                self.__pools[key] = ConnectionPool(db, DB_POOL_SIZE if read_only else 1, read_only)
 
-        return teams_data
+            return self.__pools[key]
 
+    def __reader(self, db: str):
+        """borrow a read-only connection"""
+        return self.__pool(db, True).connection()
 
-    def __insert_fixtures_data(
-        self,
-        cursor: sqlite3.Cursor,
-        fixtures: pd.DataFrame,
-        teams_data: dict
-    ) -> None:
-        """insert fixtures data"""
-        records = []
-
-        for row in fixtures.itertuples():
-            if row.home in teams_data.keys() and row.away in teams_data.keys():
-                record = (
-                    row.date,
-                    row.time,
-                    row.match_status,
-                    teams_data[row.home],
-                    teams_data[row.away],
-                )
-                records.append(record)
+    def __streamer(self, db: str):
+        """open a read-only connection outside the pool, so slow streams never hold a pooled one"""
+        return self.__pool(db, True).unpooled()
 
+    def __writer(self, db: str):
+        """borrow the single write connection"""
+        return self.__pool(db, False).connection()
+
+    def close(self) -> None:
+        """close every pooled connection"""
+        with self.__pools_lock:
+            for pool in self.__pools.values():
+                pool.close()
+
+    def __stage(
+        self, cursor: sqlite3.Cursor, table: str, columns: list[str], rows: Iterable[tuple]
+    ) -> None:
+        """stream rows into a fresh temp staging table"""
+        cursor.execute(f"DROP TABLE IF EXISTS temp.{table}")
+        cursor.execute(f"CREATE TEMP TABLE {table} ({', '.join(columns)})")
         cursor.executemany(
-            """INSERT OR IGNORE INTO fixtures (
-                    date,
-                    time,
-                    match_status,
-                    home_team_id,
-                    away_team_id
-                ) VALUES (
-                    ?,
-                    ?,
-                    ?,
-                    ?,
-                    ?
-                )
-            """,
-            records
+            f"INSERT INTO temp.{table} VALUES ({', '.join('?' * len(columns))})", rows
         )
 
-    def __insert_results_data(
+    def __stage_with_ids(
+        self, cursor: sqlite3.Cursor, kind: str, columns: list[str], descending: bool = False
+    ) -> None:
+        """
+        stage the scraped matches of a kind with their league and team names
+        swapped for ids, in scraped order (or reversed), leaving out rows with an unknown name
+        """
+        cursor.execute(f"DROP TABLE IF EXISTS temp.staged_{kind}")
+        cursor.execute(
+            f"""
+            CREATE TEMP TABLE staged_{kind} AS
+            SELECT {", ".join(f"{ID_COLUMNS.get(c, f'scraped.{c}')} AS {c}" for c in columns)}
+            FROM temp.scraped_{kind} AS scraped
+            JOIN leagues ON leagues.name = scraped.league AND leagues.season = scraped.season
+            JOIN teams AS home
+                ON home.league_id = leagues.league_id AND home.name = scraped.home
+            JOIN teams AS away
+                ON away.league_id = leagues.league_id AND away.name = scraped.away
+            ORDER BY scraped.rowid {"DESC" if descending else "ASC"}
+            """
+        )
+
+    def __count_staged_leagues(self, cursor: sqlite3.Cursor, table: str) -> int:
+        """rows of the target table in the leagues being loaded"""
+        cursor.execute(
+            f"""
+            SELECT count(*) FROM {table}
+            WHERE league_id IN (SELECT league_id FROM temp.staged_{table})
+            """
+        )
+        return cursor.fetchone()[0]
+
+    def __upsert(
         self,
         cursor: sqlite3.Cursor,
-        results: pd.DataFrame,
-        teams_data: dict
-    ) -> None:
-        """insert results data"""
-        records = []
-        results.sort_index(ascending=False, inplace=True)
-        for row in results.itertuples():
-            if row.home in teams_data.keys() and row.away in teams_data.keys():
-                record = (
-                    row.date,
-                    row.time,
-                    teams_data[row.home],
-                    teams_data[row.away],
-                    row.home_scores,
-                    row.away_scores,
-                )
-                records.append(record)
+        table: str,
+        columns: list[str],
+        key: list[str],
+        update: list[str]
+    ) -> dict[str, int]:
+        """
+        copy a staged table into its target in one statement, updating only the
+        conflicting rows whose values changed, and count what was inserted and updated
+        """
+        columns = ", ".join(columns)
+        if update:
+            action = f"""DO UPDATE SET {", ".join(f"{c} = excluded.{c}" for c in update)}
+                WHERE ({", ".join(f"{table}.{c}" for c in update)})
+                    IS NOT ({", ".join(f"excluded.{c}" for c in update)})"""
+        else:
+            action = "DO NOTHING"
 
-        cursor.executemany(
+        before = self.__count_staged_leagues(cursor, table)
+        cursor.execute(
+            f"""
+            INSERT INTO {table} ({columns})
+            SELECT {columns} FROM temp.staged_{table} WHERE true ORDER BY rowid
+            ON CONFLICT ({", ".join(key)}) {action}
             """
-            INSERT OR IGNORE INTO results (
-                date,
-                time,
-                home_team_id,
-                away_team_id,
-                home_score,
-                away_score
-            ) VALUES (
-                ?,
-                ?,
-                ?,
-                ?,
-                ?,
-                ?
+        )
+        changed = cursor.rowcount
+        inserted = self.__count_staged_leagues(cursor, table) - before
+
+        return {"inserted": inserted, "updated": changed - inserted, "deleted": 0}
+
+    def __delete_stale_fixtures(self, cursor: sqlite3.Cursor) -> int:
+        """
+        delete fixtures that have been played, and those a league's fixtures
+        page no longer lists (rescheduled or cancelled matches). a page cut short
+        by the show more pagination says nothing about the fixtures after its
+        last date, so only those up to it are compared
+        """
+        cursor.execute(
+            """
+            DELETE FROM fixtures
+            WHERE league_id IN (SELECT league_id FROM temp.staged_results)
+            AND EXISTS (
+                SELECT 1 FROM results
+                WHERE results.league_id = fixtures.league_id
+                AND results.date = fixtures.date
+                AND results.home_team_id = fixtures.home_team_id
+                AND results.away_team_id = fixtures.away_team_id
             )
-            """, records,
+            """
+        )
+        deleted = cursor.rowcount
+
+        cursor.execute(
+            """
+            DELETE FROM fixtures
+            WHERE league_id IN (SELECT league_id FROM temp.staged_fixtures)
+            AND date <= (
+                SELECT MAX(staged.date) FROM temp.staged_fixtures AS staged
+                WHERE staged.league_id = fixtures.league_id
+            )
+            AND (date, time, home_team_id, away_team_id) NOT IN (
+                SELECT date, time, home_team_id, away_team_id FROM temp.staged_fixtures
+            )
+            """
+        )
+
+        return deleted + cursor.rowcount
+
+    def __insert_leagues_data(self, cursor: sqlite3.Cursor) -> None:
+        """insert leagues data, one row per league and season, in the order they were scraped"""
+        cursor.execute(
+            f"""
+            INSERT OR IGNORE INTO leagues (name, season)
+            {_first_seen("league, season", [
+                "SELECT league, season, rowid AS position FROM temp.scraped_results",
+                "SELECT league, season, rowid FROM temp.scraped_fixtures",
+            ])}
+            """
+        )
+
+    def __insert_teams_data(self, cursor: sqlite3.Cursor) -> dict[str, int]:
+        """
+        insert every team that has a result or a fixture, keyed by (league_id, name)
+        since every season has its own rows
+        """
+        sides = [
+            f"""
+            SELECT scraped.{side} AS name, leagues.league_id, scraped.rowid AS position
+            FROM temp.scraped_{kind} AS scraped
+            JOIN leagues ON leagues.name = scraped.league AND leagues.season = scraped.season
+            WHERE scraped.{side} IS NOT NULL
+            """
+            for kind in ("results", "fixtures")
+            for side in ("home", "away")
+        ]
+
+        cursor.execute("DROP TABLE IF EXISTS temp.staged_teams")
+        cursor.execute(f"CREATE TEMP TABLE staged_teams AS {_first_seen('name, league_id', sides)}")
+
+        return self.__upsert(cursor, "teams", ["name", "league_id"], ["name", "league_id"], [])
+
+    def __insert_fixtures_data(self, cursor: sqlite3.Cursor) -> dict[str, int]:
+        """upsert fixtures data, picking up status changes"""
+        columns = ["date", "time", "match_status", "home_team_id", "away_team_id", "league_id"]
+        self.__stage_with_ids(cursor, "fixtures", columns)
+
+        return self.__upsert(
+            cursor,
+            "fixtures",
+            columns,
+            ["date", "time", "home_team_id", "away_team_id"],
+            ["match_status"],
         )
 
-    def __insert_standings_data(
+    def __insert_results_data(self, cursor: sqlite3.Cursor) -> dict[str, int]:
+        """
+        upsert results data oldest first, picking up score corrections, and
+        stage what changed for the standings
+        """
+        columns = [
+            "date", "time", "home_team_id", "away_team_id", "home_score", "away_score", "league_id"
+        ]
+        self.__stage_with_ids(cursor, "results", columns, descending=True)
+        standings.stage_result_deltas(cursor)
+
+        return self.__upsert(
+            cursor,
+            "results",
+            columns,
+            ["date", "time", "home_team_id", "away_team_id"],
+            ["home_score", "away_score"],
+        )
+
+    def __update_scrape_state(
         self,
         cursor: sqlite3.Cursor,
-        standings: pd.DataFrame,
-        teams_data: dict
+        scrape_state: dict[str, tuple[str | None, str | None]]
     ) -> None:
-        """insert standings data"""
-
-        records = []
-        for row in standings.itertuples():
-            if row.team in teams_data.keys():
-                record = (
-                    teams_data[row.team],
-                    row.MP,
-                    row.W,
-                    row.D,
-                    row.L,
-                    row.GF,
-                    row.GA,
-                    row.GD,
-                    row.PTS,
-                )
-
-                records.append(record)
+        """save each league's high-water mark"""
+        records = [
+            (league, last_result_date, fixtures_hash)
+            for league, (last_result_date, fixtures_hash) in scrape_state.items()
+        ]
 
         cursor.executemany(
             """
-            INSERT OR IGNORE INTO standings (
-                team_id,
-                MP,
-                W,
-                D,
-                L,
-                GF,
-                GA,
-                GD,
-                PTS
+            INSERT INTO scrape_state (
+                league,
+                last_result_date,
+                fixtures_hash
             ) VALUES (
-                ?,
-                ?,
-                ?,
-                ?,
-                ?,
-                ?,
                 ?,
                 ?,
                 ?
             )
+            ON CONFLICT (league) DO UPDATE SET
+                last_result_date = COALESCE(
+                    MAX(excluded.last_result_date, scrape_state.last_result_date),
+                    excluded.last_result_date,
+                    scrape_state.last_result_date
+                ),
+                fixtures_hash = COALESCE(excluded.fixtures_hash, scrape_state.fixtures_hash)
             """, records,
         )
 
+    def __bump_data_version(self, cursor: sqlite3.Cursor) -> None:
+        """mark every cached response as stale"""
+        cursor.execute("UPDATE data_version SET version = version + 1")
+
+    def get_data_version(self, db: str) -> int:
+        """get the counter bumped by every commit that changes the served data"""
+        with self.__reader(db) as conn:
+            return conn.execute("SELECT version FROM data_version").fetchone()[0]
+
+    def __write_views(self, cursor: sqlite3.Cursor, league_ids: list[int]) -> None:
+        """
+        materialize the views (BATCH_VIEWS) of the leagues as their endpoints
+        serve them, with the data version they were built at
+        """
+        if not league_ids:
+            return
+
+        version = cursor.execute("SELECT version FROM data_version").fetchone()[0]
+        placeholders = ", ".join("?" * len(league_ids))
+
+        for view in BATCH_VIEWS:
+            params = list(league_ids)
+            if view in MATCH_FIELDS:
+                params += [None, None]
+
+            rows = {league_id: [] for league_id in league_ids}
+            for league_id, *row in cursor.execute(
+                self.__batch_query(view, placeholders, False), params
+            ).fetchall():
+                rows[league_id].append(tuple(row))
+
+            cursor.executemany(
+                """
+                INSERT INTO materialized_views (league_id, view_name, version, body)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT (league_id, view_name) DO UPDATE SET
+                    version = excluded.version,
+                    body = excluded.body
+                """,
+                [
+                    (league_id, view, version, indented(
+                        view_records(view, data, list(MATCH_FIELDS.get(view, ())))
+                    ))
+                    for league_id, data in rows.items()
+                ],
+            )
+
+    def materialize_views(self, db: str) -> int:
+        """materialize the views of every league that misses any, returning how many leagues"""
+        with self.__writer(db) as conn:
+            cursor = conn.cursor()
+
+            try:
+                league_ids = [
+                    league_id for (league_id,) in cursor.execute(
+                        """
+                        SELECT league_id FROM leagues
+                        WHERE (
+                            SELECT count(*) FROM materialized_views
+                            WHERE materialized_views.league_id = leagues.league_id
+                        ) < ?
+                        """,
+                        (len(BATCH_VIEWS),)
+                    ).fetchall()
+                ]
+                self.__write_views(cursor, league_ids)
+                conn.commit()
+            finally:
+                cursor.close()
+
+        return len(league_ids)
+
+    def __drop_staged(self, cursor: sqlite3.Cursor) -> None:
+        """drop the temp staging tables of a load"""
+        for table in ("teams", "fixtures", "results"):
+            cursor.execute(f"DROP TABLE IF EXISTS temp.staged_{table}")
+
+        for kind in ("results", "fixtures"):
+            cursor.execute(f"DROP TABLE IF EXISTS temp.scraped_{kind}")
+
     def insert_data(
         self,
         db: str,
-        results: pd.DataFrame,
-        fixtures: pd.DataFrame,
-        standings: pd.DataFrame
-    ) -> None:
-        """insert all data"""
-        try:
-            conn = sqlite3.connect(db)
+        results: "pd.DataFrame",
+        fixtures: "pd.DataFrame",
+        scrape_state: dict[str, tuple[str | None, str | None]] | None = None
+    ) -> dict[str, dict[str, int]]:
+        """
+        sync all data of the frames from Preprocessing and the high-water marks
+        of an incremental scrape, returning the rows inserted, updated and deleted per table
+        """
+        results = results.rename(columns={"home_scores": "home_score", "away_scores": "away_score"})
+
+        return self.__load(
+            db,
+            _frame_rows(results, SCRAPED_COLUMNS["results"]),
+            _frame_rows(fixtures, SCRAPED_COLUMNS["fixtures"]),
+            scrape_state,
+        )
+
+    def insert_records(
+        self,
+        db: str,
+        results: list["Result"],
+        fixtures: list["Fixture"],
+        scrape_state: dict[str, tuple[str | None, str | None]] | None = None
+    ) -> dict[str, dict[str, int]]:
+        """insert_data for the records of RecordPreprocessing, without building any frame"""
+        return self.__load(
+            db,
+            map(attrgetter(*SCRAPED_COLUMNS["results"]), results),
+            map(attrgetter(*SCRAPED_COLUMNS["fixtures"]), fixtures),
+            scrape_state,
+        )
+
+    def __load(
+        self,
+        db: str,
+        results: Iterable[tuple],
+        fixtures: Iterable[tuple],
+        scrape_state: dict[str, tuple[str | None, str | None]] | None
+    ) -> dict[str, dict[str, int]]:
+        """
+        stage the scraped rows and merge them in one transaction, with their names
+        swapped for ids in sql. the standings are updated from the results
+        that were added or corrected, and the views of the loaded leagues rematerialized
+        """
+        with self.__writer(db) as conn:
             cursor = conn.cursor()
 
-            leagues_data = self.__insert_leagues_data(
-                cursor,
-                results.loc[:, ["league", "season"]],
-                fixtures.loc[:, ["league", "season"]],
-            )
+            try:
+                self.__stage(cursor, "scraped_results", SCRAPED_COLUMNS["results"], results)
+                self.__stage(cursor, "scraped_fixtures", SCRAPED_COLUMNS["fixtures"], fixtures)
 
-            teams_data = self.__insert_teams_data(
-                cursor, standings.loc[:, ["league", "team"]], leagues_data
-            )
+                self.__insert_leagues_data(cursor)
 
-            self.__insert_fixtures_data(
-                cursor,
-                fixtures.loc[:, ["match_status", "home", "away", "date", "time"]],
-                teams_data,
-            )
+                changes = {"teams": self.__insert_teams_data(cursor)}
+                changes["fixtures"] = self.__insert_fixtures_data(cursor)
+                changes["results"] = self.__insert_results_data(cursor)
+                changes["fixtures"]["deleted"] = self.__delete_stale_fixtures(cursor)
 
-            self.__insert_results_data(
-                cursor,
-                results.loc[
-                    :, ["date", "time", "home", "away", "home_scores", "away_scores"]
-                ],
-                teams_data,
+                changes["standings"] = standings.apply_result_deltas(cursor)
+
+                if any(count for counts in changes.values() for count in counts.values()):
+                    self.__bump_data_version(cursor)
+                    self.__write_views(cursor, [
+                        league_id for (league_id,) in cursor.execute(
+                            "SELECT DISTINCT league_id FROM temp.staged_teams"
+                        ).fetchall()
+                    ])
+
+                self.__drop_staged(cursor)
+
+                if scrape_state:
+                    self.__update_scrape_state(cursor, scrape_state)
+
+                conn.commit()
+
+            except Error as e:
+                print(f"SQLite Error occurred: {e}")
+                print(f"{db} rollback!")
+                conn.rollback()
+                raise
+
+            finally:
+                cursor.close()
+
+        return changes
+
+    def rebuild_standings(self, db: str) -> int:
+        """recompute the standings from the stored results, returning the rows that changed"""
+        with self.__writer(db) as conn:
+            cursor = conn.cursor()
+
+            try:
+                fixed = standings.rebuild(cursor)
+                if fixed:
+                    self.__bump_data_version(cursor)
+                    self.__write_views(cursor, [
+                        league_id for (league_id,) in cursor.execute(
+                            "SELECT league_id FROM leagues"
+                        ).fetchall()
+                    ])
+                conn.commit()
+            finally:
+                cursor.close()
+
+        return fixed
+
+    def verify_standings(self, db: str) -> list[int]:
+        """team ids whose maintained standings differ from a full recomputation"""
+        with self.__reader(db) as conn:
+            cursor = conn.cursor()
+
+            try:
+                return standings.verify(cursor)
+            finally:
+                cursor.close()
+
+    def verify_views(self, db: str) -> list[tuple[str, str, str]]:
+        """(league, season, view) of every materialized view that is missing or differs from its live query"""
+        with self.__reader(db) as conn:
+            leagues = conn.execute("SELECT name, season FROM leagues ORDER BY league_id").fetchall()
+
+        live = {
+            "standings": lambda name, season: self.get_standings(name, db, season),
+            "results": lambda name, season: self.get_results(name, db, season)[0],
+            "fixtures": lambda name, season: self.get_fixtures(name, db, season)[0],
+            "teams": lambda name, season: [
+                (team_id, team) for _, team, team_id in self.get_teams(name, db, season)
+            ],
+        }
+
+        mismatches = []
+        for name, season in leagues:
+            for view in BATCH_VIEWS:
+                stored = self.get_view(name, view, db, season)
+                body = indented(
+                    view_records(view, live[view](name, season), list(MATCH_FIELDS.get(view, ())))
+                )
+
+                if stored != (season, body):
+                    mismatches.append((name, season, view))
+
+        return mismatches
+
+    def acquire_scrape_lock(
+        self, db: str, job_id: str, stale_after: int = SCRAPE_LOCK_TIMEOUT
+    ) -> bool:
+        """claim the single scrape slot, taking over a lock older than stale_after seconds"""
+        now = datetime.now()
+        stale = (now - timedelta(seconds=stale_after)).isoformat(timespec="seconds")
+
+        with self.__writer(db) as conn, conn:
+            conn.execute("DELETE FROM scrape_lock WHERE acquired_at < ?", (stale,))
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO scrape_lock (lock_id, job_id, acquired_at) VALUES (1, ?, ?)",
+                (job_id, now.isoformat(timespec="seconds")),
             )
+            acquired = cursor.rowcount == 1
+
+        return acquired
+
+    def release_scrape_lock(self, db: str, job_id: str) -> None:
+        """free the scrape slot held by job_id"""
+        with self.__writer(db) as conn, conn:
+            conn.execute("DELETE FROM scrape_lock WHERE job_id = ?", (job_id,))
 
-            self.__insert_standings_data(
-                cursor,
-                standings.loc[:, ["team", "MP", "W", "D", "L", "GF", "GA", "GD", "PTS"]],
-                teams_data,
+    def get_scrape_lock_holder(self, db: str) -> str | None:
+        """get the id of the job holding the scrape slot, in whichever process it runs"""
+        with self.__reader(db) as conn:
+            data = conn.execute("SELECT job_id FROM scrape_lock").fetchone()
+
+        return data[0] if data else None
+
+    def save_job(self, db: str, job: dict) -> None:
+        """store a scrape job's status for every process to read, keeping the JOB_HISTORY latest"""
+        with self.__writer(db) as conn, conn:
+            conn.execute(
+                """
+                INSERT INTO scrape_jobs (job_id, job) VALUES (?, ?)
+                ON CONFLICT (job_id) DO UPDATE SET job = excluded.job
+                """,
+                (job["id"], dumps(job)),
+            )
+            conn.execute(
+                """
+                DELETE FROM scrape_jobs WHERE rowid NOT IN (
+                    SELECT rowid FROM scrape_jobs ORDER BY rowid DESC LIMIT ?
+                )
+                """,
+                (JOB_HISTORY,),
             )
 
-            conn.commit()
+    def get_job(self, db: str, job_id: str) -> dict | None:
+        """get a stored scrape job's status"""
+        with self.__reader(db) as conn:
+            data = conn.execute(
+                "SELECT job FROM scrape_jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
 
-        except Error as e:
-            print(f"SQLite Error occurred: {e}")
-            print(f"{db} rollback!")
-            conn.rollback()
+        return loads(data[0]) if data else None
 
-        finally:
-            cursor.close()
-            conn.close()
+    def get_scrape_state(self, db: str) -> dict[str, tuple[str | None, str | None]]:
+        """get the last result date (ISO) and fixtures hash of each league"""
+        query = "SELECT league, last_result_date, fixtures_hash FROM scrape_state"
+        with self.__reader(db) as conn:
+            data = conn.execute(query).fetchall()
 
-    def get_teams(self, league_name: str, db: str):
-        """get teams data by league"""
-        conn = sqlite3.connect(db)
+        return {
+            league: (last_result_date, fixtures_hash)
+            for league, last_result_date, fixtures_hash in data
+        }
+
+    def get_kickoffs(self, db: str) -> dict[str, list[datetime]]:
+        """get the kick-off time of every fixture that is not postponed, by league"""
         query = """
+            SELECT DISTINCT leagues.name, fixtures.kickoff
+            FROM fixtures
+            INNER JOIN leagues ON fixtures.league_id = leagues.league_id
+            WHERE fixtures.match_status = 'not_postponed'
+        """
+        with self.__reader(db) as conn:
+            data = conn.execute(query).fetchall()
+
+        kickoffs = {}
+        for league, match_kickoff in data:
+            try:
+                kickoff = datetime.strptime(match_kickoff, "%Y-%m-%d %H:%M")
+            except ValueError:
+                continue
+
+            kickoffs.setdefault(league, []).append(kickoff)
+
+        return kickoffs
+
+    def get_seasons(self, league_name: str, db: str) -> list[str]:
+        """get every stored season of a league, latest first"""
+        query = "SELECT season FROM leagues WHERE name = ? ORDER BY season DESC"
+        with self.__reader(db) as conn:
+            data = conn.execute(query, (league_name.replace("-", " "),)).fetchall()
+
+        return [season for (season,) in data]
+
+    def get_season(self, league_name: str, season: str | None, db: str) -> str | None:
+        """get the stored season the endpoints serve, the latest one when season is None"""
+        query = f"SELECT season FROM leagues WHERE league_id = {LEAGUE_ID}"
+        with self.__reader(db) as conn:
+            data = conn.execute(query, self.__league_params(league_name, season)).fetchone()
+
+        return data[0] if data else None
+
+    def get_view(
+        self, league_name: str, view: str, db: str, season: str | None = None
+    ) -> tuple[str, str] | None:
+        """
+        get the season and materialized body of a league's view (latest season
+        by default) by its key, None when it has not been materialized
+        """
+        query = f"""
+            SELECT leagues.season, materialized_views.body
+            FROM materialized_views
+            INNER JOIN leagues ON materialized_views.league_id = leagues.league_id
+            WHERE materialized_views.league_id = {LEAGUE_ID}
+            AND materialized_views.view_name = :view
+        """
+        params = self.__league_params(league_name, season)
+        params.update(view=view)
+
+        with self.__reader(db) as conn:
+            return conn.execute(query, params).fetchone()
+
+    def __league_params(self, league_name: str, season: str | None) -> dict:
+        return {"league": league_name.replace("-", " "), "season": season}
+
+    def get_teams(self, league_name: str, db: str, season: str | None = None):
+        """get teams data by league and season (latest by default), in team_id order"""
+        query = f"""
             SELECT leagues.name, teams.name, teams.team_id
             FROM teams
             INNER JOIN leagues ON teams.league_id = leagues.league_id
-            WHERE leagues.name = ?
+            WHERE teams.league_id = {LEAGUE_ID}
+            ORDER BY {TEAMS_ORDER}
         """
-        data = conn.execute(query, (league_name.replace("-", " "),)).fetchall()
-        conn.close()
+        with self.__reader(db) as conn:
+            data = conn.execute(query, self.__league_params(league_name, season)).fetchall()
 
         return data
 
-    def get_results(self, league_name: str, db: str):
-        """get results data by league"""
-        conn = sqlite3.connect(db)
-        query = """
-            SELECT
-                results.result_id,
-                results.date, 
-                results.time, 
-                home.name,
-                away.name, 
-                results.home_score, 
-                results.away_score
-            FROM results
-            INNER JOIN teams AS home ON results.home_team_id = home.team_id
-            INNER JOIN teams AS away ON results.away_team_id = away.team_id
-            INNER JOIN leagues ON home.league_id = leagues.league_id
-            WHERE leagues.name = ?
-        """
-        data = conn.execute(query, (league_name.replace("-", " "),)).fetchall()
-        conn.close()
+    def __matches_query(
+        self,
+        table: str,
+        fields: dict[str, str],
+        league_name: str,
+        season: str | None,
+        page: dict
+    ) -> tuple[str, dict]:
+        """
+        query one page of a league's results or fixtures ordered by (date, id),
+        selecting and joining only the requested fields, then the (date, id) key
+        """
+        selected = page.get("fields") or list(fields)
+        id_column = f"{table}.{table[:-1]}_id"
+        date_column = f"{table}.date"
+        descending = page.get("descending", False)
+
+        joins = [
+            f"INNER JOIN teams AS {side} ON {table}.{side}_team_id = {side}.team_id"
+            for side in ("home", "away") if side in selected
+        ]
+
+        query = f"""
+            SELECT {", ".join(fields[field] for field in selected)}, {date_column}, {id_column}
+            FROM {table}
+            {" ".join(joins)}
+            WHERE {table}.league_id = {LEAGUE_ID}
+            AND (:date_from IS NULL OR {date_column} >= :date_from)
+            AND (:date_to IS NULL OR {date_column} <= :date_to)
+            AND (:after_date IS NULL OR ({date_column}, {id_column})
+                {"<" if descending else ">"} (:after_date, :after_id))
+            ORDER BY {date_column} {"DESC" if descending else "ASC"},
+                {id_column} {"DESC" if descending else "ASC"}
+            LIMIT :limit
+        """
+
+        limit = page.get("limit")
+        after_date, after_id = page.get("after") or (None, None)
+        params = self.__league_params(league_name, season)
+        params.update(
+            date_from=page.get("date_from"),
+            date_to=page.get("date_to"),
+            after_date=after_date,
+            after_id=after_id,
+            limit=-1 if limit is None else limit + 1,
+        )
+
+        return query, params
+
+    def __get_matches(
+        self,
+        table: str,
+        fields: dict[str, str],
+        league_name: str,
+        db: str,
+        season: str | None,
+        page: dict
+    ) -> tuple[list[tuple], tuple[str, int] | None]:
+        """get one page of matches and the key to continue after when there are more"""
+        query, params = self.__matches_query(table, fields, league_name, season, page)
+
+        with self.__reader(db) as conn:
+            data = conn.execute(query, params).fetchall()
+
+        limit = page.get("limit")
+        next_key = None
+        if limit is not None and len(data) > limit:
+            data = data[:limit]
+            next_key = data[-1][-2:] if data else None
+
+        return [row[:-2] for row in data], next_key
+
+    def get_results(
+        self, league_name: str, db: str, season: str | None = None, page: dict | None = None
+    ):
+        """
+        get results data by league and season (latest by default), with the
+        page's fields, date_from/date_to (yyyy-mm-dd), after key, limit and order.
+        returns the rows and the key to continue after when there are more
+        """
+        return self.__get_matches(
+            "results", RESULT_FIELDS, league_name, db, season, page or {}
+        )
+
+    def get_fixtures(
+        self, league_name: str, db: str, season: str | None = None, page: dict | None = None
+    ):
+        """get fixtures data by league and season (latest by default), paged like get_results"""
+        return self.__get_matches(
+            "fixtures", FIXTURE_FIELDS, league_name, db, season, page or {}
+        )
+
+    def __iter_matches(
+        self,
+        table: str,
+        fields: dict[str, str],
+        league_name: str,
+        db: str,
+        season: str | None,
+        page: dict
+    ) -> Iterator[tuple]:
+        """
+        stream the matches of a page from the cursor, holding a connection of
+        its own until the last row has been read or the stream is closed
+        """
+        query, params = self.__matches_query(table, fields, league_name, season, page)
+        limit = page.get("limit")
+
+        with self.__streamer(db) as conn:
+            cursor = conn.execute(query, params)
+
+            try:
+                count = 0
+                while rows := cursor.fetchmany(STREAM_BATCH_SIZE):
+                    for row in rows[:None if limit is None else limit - count]:
+                        yield row[:-2]
+
+                    count += len(rows)
+                    if limit is not None and count >= limit:
+                        break
+            finally:
+                cursor.close()
+
+    def iter_results(
+        self, league_name: str, db: str, season: str | None = None, page: dict | None = None
+    ) -> Iterator[tuple]:
+        """stream results data like get_results, without the continuation key"""
+        return self.__iter_matches(
+            "results", RESULT_FIELDS, league_name, db, season, page or {}
+        )
+
+    def iter_fixtures(
+        self, league_name: str, db: str, season: str | None = None, page: dict | None = None
+    ) -> Iterator[tuple]:
+        """stream fixtures data like get_fixtures, without the continuation key"""
+        return self.__iter_matches(
+            "fixtures", FIXTURE_FIELDS, league_name, db, season, page or {}
+        )
+
+    def get_standings(self, league_name: str, db: str, season: str | None = None):
+        """get standiings data by league and season (latest by default)"""
+        query = f"""
+            SELECT {STANDINGS_COLUMNS}
+            FROM standings
+            INNER JOIN teams ON standings.team_id = teams.team_id
+            WHERE standings.league_id = {LEAGUE_ID}
+            ORDER BY {STANDINGS_ORDER}
+        """
+        with self.__reader(db) as conn:
+            data = conn.execute(query, self.__league_params(league_name, season)).fetchall()
 
         return data
 
-    def get_fixtures(self, league_name: str, db: str):
-        """get fixtures data by league"""
-        conn = sqlite3.connect(db)
-        query = """
+    def get_standings_table(
+        self,
+        league_name: str,
+        db: str,
+        season: str | None = None,
+        venue: str | None = None,
+        date: str | None = None,
+        matchday: int | None = None
+    ):
+        """
+        compute standings from the results: home or away matches only, up to a
+        date (yyyy-mm-dd) and up to each team's matchday-th match
+        """
+        counted = """(
+            SELECT * FROM team_matches
+            WHERE (:venue IS NULL OR venue = :venue)
+            AND (:matchday IS NULL OR matchday <= :matchday)
+        )"""
+        query = f"""
+            WITH team_matches AS (
+                SELECT *, ROW_NUMBER() OVER (
+                    PARTITION BY team_id ORDER BY kickoff
+                ) AS matchday
+                FROM ({standings.sides(LEAGUE_MATCHES, ", kickoff")})
+            )
             SELECT
-                fixtures.fixture_id,
-                fixtures.date,
-                fixtures.time,
-                fixtures.match_status,
-                home.name,
-                away.name
-            FROM fixtures
-            INNER JOIN teams AS home ON fixtures.home_team_id = home.team_id
-            INNER JOIN teams AS away ON fixtures.away_team_id = away.team_id
-            INNER JOIN leagues ON home.league_id = leagues.league_id
-            WHERE leagues.name = ?
+                teams.team_id,
+                teams.name,
+                {", ".join(f"COALESCE(computed.{c}, 0) AS {c}" for c in standings.COLUMNS)}
+            FROM teams
+            LEFT JOIN ({standings.aggregate(counted)}) AS computed
+                ON computed.team_id = teams.team_id
+            WHERE teams.league_id = {LEAGUE_ID}
+            ORDER BY {STANDINGS_ORDER}
         """
-        data = conn.execute(query, (league_name.replace("-", " "),)).fetchall()
-        conn.close()
+        params = self.__league_params(league_name, season)
+        params.update(venue=venue, date=date, matchday=matchday)
+
+        with self.__reader(db) as conn:
+            data = conn.execute(query, params).fetchall()
 
         return data
 
-    def get_standings(self, league_name: str, db: str):
-        """get standiings data by league"""
-        conn = sqlite3.connect(db)
-        query = """
+    def get_form(
+        self,
+        league_name: str,
+        db: str,
+        season: str | None = None,
+        last: int = FORM_MATCHES,
+        venue: str | None = None,
+        date: str | None = None
+    ):
+        """
+        get every team's last matches up to a date (yyyy-mm-dd): their
+        outcomes oldest first, e.g. "WDLWW", and the table of those matches
+        """
+        query = f"""
+            WITH recent_matches AS (
+                SELECT * FROM (
+                    SELECT *, ROW_NUMBER() OVER (
+                        PARTITION BY team_id ORDER BY kickoff DESC
+                    ) AS recent
+                    FROM ({standings.sides(LEAGUE_MATCHES, ", kickoff")})
+                    WHERE (:venue IS NULL OR venue = :venue)
+                )
+                WHERE recent <= :last
+            ),
+            form AS (
+                SELECT team_id, group_concat(outcome, '') OVER (
+                    PARTITION BY team_id ORDER BY recent DESC
+                    ROWS BETWEEN UNBOUNDED PRECEDING AND UNBOUNDED FOLLOWING
+                ) AS outcomes, recent
+                FROM (
+                    SELECT *, CASE WHEN gf > ga THEN 'W' WHEN gf = ga THEN 'D' ELSE 'L' END AS outcome
+                    FROM recent_matches
+                )
+            )
             SELECT
-                standings.standing_id,
+                teams.team_id,
                 teams.name,
-                standings.MP,
-                standings.W,
-                standings.D,
-                standings.L,
-                standings.GF,
-                standings.GA,
-                standings.GD,
-                standings.PTS
-            FROM standings
-            INNER JOIN teams ON standings.team_id = teams.team_id
-            INNER JOIN leagues ON teams.league_id = leagues.league_id
-            WHERE leagues.name = ?
-            ORDER BY standings.PTS DESC, standings.GD DESC, standings.GF DESC
+                COALESCE(form.outcomes, ''),
+                {", ".join(f"COALESCE(computed.{c}, 0) AS {c}" for c in standings.COLUMNS)}
+            FROM teams
+            LEFT JOIN form ON form.team_id = teams.team_id AND form.recent = 1
+            LEFT JOIN ({standings.aggregate("recent_matches")}) AS computed
+                ON computed.team_id = teams.team_id
+            WHERE teams.league_id = {LEAGUE_ID}
+            ORDER BY {STANDINGS_ORDER}
         """
-        data = conn.execute(query, (league_name.replace("-", " "),)).fetchall()
-        conn.close()
+        params = self.__league_params(league_name, season)
+        params.update(last=last, venue=venue, date=date)
+
+        with self.__reader(db) as conn:
+            data = conn.execute(query, params).fetchall()
 
         return data
+
+    def __batch_query(self, view: str, leagues: str, descending: bool) -> str:
+        """one view of all the leagues in an IN list, each row led by its league_id"""
+        if view == "standings":
+            return f"""
+                SELECT standings.league_id, {STANDINGS_COLUMNS}
+                FROM standings
+                INNER JOIN teams ON standings.team_id = teams.team_id
+                WHERE standings.league_id IN ({leagues})
+                ORDER BY standings.league_id, {STANDINGS_ORDER}
+            """
+
+        if view == "teams":
+            return f"""
+                SELECT teams.league_id, teams.team_id, teams.name
+                FROM teams
+                WHERE teams.league_id IN ({leagues})
+                ORDER BY teams.league_id, {TEAMS_ORDER}
+            """
+
+        fields = MATCH_FIELDS[view]
+        order = "DESC" if descending else "ASC"
+
+        return f"""
+            SELECT league_id, {", ".join(fields)} FROM (
+                SELECT {view}.league_id,
+                    {", ".join(f"{column} AS {field}" for field, column in fields.items())},
+                    ROW_NUMBER() OVER (
+                        PARTITION BY {view}.league_id
+                        ORDER BY {view}.date {order}, {view}.{view[:-1]}_id {order}
+                    ) AS position
+                FROM {view}
+                INNER JOIN teams AS home ON {view}.home_team_id = home.team_id
+                INNER JOIN teams AS away ON {view}.away_team_id = away.team_id
+                WHERE {view}.league_id IN ({leagues})
+            )
+            WHERE ? IS NULL OR position <= ?
+            ORDER BY league_id, position
+        """
+
+    def get_batch(
+        self,
+        league_names: list[str],
+        views: list[str],
+        db: str,
+        season: str | None = None,
+        limit: int | None = None,
+        descending: bool = False
+    ) -> dict[str, dict]:
+        """
+        get several views (BATCH_VIEWS) of several leagues over one connection,
+        with one query per view for all of them. every league maps to its season
+        (latest by default) and the rows of each view, shaped like get_standings,
+        get_results, get_fixtures and (team_id, name) for teams; results and
+        fixtures keep their first limit matches per league
+        """
+        names = list(dict.fromkeys(name.replace("-", " ") for name in league_names))
+        batch = {name: {"season": None, **{view: [] for view in views}} for name in names}
+
+        with self.__reader(db) as conn:
+            leagues = conn.execute(
+                f"""
+                    SELECT league_id, name, season FROM leagues AS latest
+                    WHERE name IN ({", ".join("?" * len(names))})
+                    AND season = COALESCE(?, (
+                        SELECT MAX(season) FROM leagues WHERE name = latest.name
+                    ))
+                """,
+                [*names, season]
+            ).fetchall()
+
+            league_of = {}
+            for league_id, name, league_season in leagues:
+                league_of[league_id] = name
+                batch[name]["season"] = league_season
+
+            placeholders = ", ".join("?" * len(league_of))
+            for view in views if league_of else []:
+                params = list(league_of)
+                if view in MATCH_FIELDS:
+                    params += [limit, limit]
+
+                for league_id, *row in conn.execute(
+                    self.__batch_query(view, placeholders, descending), params
+                ):
+                    batch[league_of[league_id]][view].append(tuple(row))
+
+        return batch
@@ -0,0 +1,174 @@
+"""standings engine, kept up to date from result deltas"""
+import sqlite3
+
+COLUMNS = ["MP", "W", "D", "L", "GF", "GA", "GD", "PTS"]
+
+MATCH_KEY = """
+    results.date = staged.date
+    AND results.time = staged.time
+    AND results.home_team_id = staged.home_team_id
+    AND results.away_team_id = staged.away_team_id
+"""
+
+STAGED_RESULTS = """(
+    SELECT DISTINCT date, time, home_team_id, away_team_id, home_score, away_score, league_id
+    FROM temp.staged_results
+)"""
+
+def sides(matches: str, columns: str = "") -> str:
+    """one row per team and match, seen from that team's side, with extra columns of the match"""
+    return f"""
+        SELECT
+            league_id,
+            home_team_id AS team_id,
+            home_score AS gf,
+            away_score AS ga,
+            sign,
+            'home' AS venue{columns}
+        FROM {matches}
+        UNION ALL
+        SELECT league_id, away_team_id, away_score, home_score, sign, 'away'{columns}
+        FROM {matches}
+    """
+
+def aggregate(team_matches: str) -> str:
+    """per-team MP, W, D, L, GF, GA, GD and PTS of the team rows, each weighted by its sign"""
+    return f"""
+        SELECT
+            team_id,
+            league_id,
+            SUM(sign) AS MP,
+            SUM(sign * (gf > ga)) AS W,
+            SUM(sign * (gf = ga)) AS D,
+            SUM(sign * (gf < ga)) AS L,
+            SUM(sign * gf) AS GF,
+            SUM(sign * ga) AS GA,
+            SUM(sign * (gf - ga)) AS GD,
+            SUM(sign * (3 * (gf > ga) + (gf = ga))) AS PTS
+        FROM {team_matches}
+        GROUP BY team_id
+    """
+
+def totals(matches: str) -> str:
+    """per-team standings of the matches"""
+    return aggregate(f"({sides(matches)})")
+
+def add_missing_teams(cursor: sqlite3.Cursor, league_ids: str) -> int:
+    """give every team of the leagues that has no standings row a row of zeros"""
+    cursor.execute(
+        f"""
+        INSERT INTO standings (team_id, league_id, {", ".join(COLUMNS)})
+        SELECT team_id, league_id, {", ".join("0" * len(COLUMNS))} FROM teams
+        WHERE league_id IN {league_ids}
+        ON CONFLICT (team_id) DO NOTHING
+        """
+    )
+    return cursor.rowcount
+
+def stage_result_deltas(cursor: sqlite3.Cursor) -> None:
+    """
+    before the staged results are merged, keep what they change: the old score
+    of every corrected result to take off and the score of every new or corrected one to add
+    """
+    cursor.execute("DROP TABLE IF EXISTS temp.result_deltas")
+    cursor.execute(
+        f"""
+        CREATE TEMP TABLE result_deltas AS
+        SELECT
+            results.league_id,
+            results.home_team_id,
+            results.away_team_id,
+            results.home_score,
+            results.away_score,
+            -1 AS sign
+        FROM {STAGED_RESULTS} AS staged
+        JOIN results ON {MATCH_KEY}
+        WHERE (results.home_score, results.away_score)
+            IS NOT (staged.home_score, staged.away_score)
+        UNION ALL
+        SELECT
+            staged.league_id,
+            staged.home_team_id,
+            staged.away_team_id,
+            staged.home_score,
+            staged.away_score,
+            1
+        FROM {STAGED_RESULTS} AS staged
+        LEFT JOIN results ON {MATCH_KEY}
+        WHERE (results.home_score, results.away_score)
+            IS NOT (staged.home_score, staged.away_score)
+        """
+    )
+
+def apply_result_deltas(cursor: sqlite3.Cursor) -> dict[str, int]:
+    """
+    add the staged deltas to the standings of the loaded leagues. only rows
+    that existed before the load count as updated, not the ones it inserts
+    """
+    cursor.execute("DROP TABLE IF EXISTS temp.delta_totals")
+    cursor.execute(
+        f"""
+        CREATE TEMP TABLE delta_totals AS
+        SELECT * FROM ({totals("temp.result_deltas")})
+        WHERE ({", ".join(COLUMNS)}) IS NOT ({", ".join("0" * len(COLUMNS))})
+        """
+    )
+
+    cursor.execute(
+        """
+        SELECT count(*) FROM temp.delta_totals
+        WHERE team_id IN (SELECT team_id FROM standings)
+        """
+    )
+    updated = cursor.fetchone()[0]
+
+    inserted = add_missing_teams(cursor, "(SELECT league_id FROM temp.staged_teams)")
+
+    cursor.execute(
+        f"""
+        INSERT INTO standings (team_id, league_id, {", ".join(COLUMNS)})
+        SELECT team_id, league_id, {", ".join(COLUMNS)} FROM temp.delta_totals WHERE true
+        ON CONFLICT (team_id) DO UPDATE SET
+            {", ".join(f"{c} = standings.{c} + excluded.{c}" for c in COLUMNS)}
+        """
+    )
+
+    cursor.execute("DROP TABLE temp.result_deltas")
+    cursor.execute("DROP TABLE temp.delta_totals")
+
+    return {"inserted": inserted, "updated": updated, "deleted": 0}
+
+def rebuild(cursor: sqlite3.Cursor) -> int:
+    """recompute every team's standings from the stored results, returning the rows fixed"""
+    cursor.execute(
+        f"""
+        INSERT INTO standings (team_id, league_id, {", ".join(COLUMNS)})
+        SELECT
+            teams.team_id,
+            teams.league_id,
+            {", ".join(f"COALESCE(computed.{c}, 0)" for c in COLUMNS)}
+        FROM teams
+        LEFT JOIN ({totals("(SELECT *, 1 AS sign FROM results)")}) AS computed
+            ON computed.team_id = teams.team_id
+        WHERE true
+        ON CONFLICT (team_id) DO UPDATE SET
+            {", ".join(f"{c} = excluded.{c}" for c in COLUMNS)}
+        WHERE ({", ".join(f"standings.{c}" for c in COLUMNS)})
+            IS NOT ({", ".join(f"excluded.{c}" for c in COLUMNS)})
+        """
+    )
+    return cursor.rowcount
+
+def verify(cursor: sqlite3.Cursor) -> list[int]:
+    """the team_id of every standings row that differs from a recomputation from the results"""
+    cursor.execute(
+        f"""
+        SELECT stored.team_id FROM standings AS stored
+        LEFT JOIN ({totals("(SELECT *, 1 AS sign FROM results)")}) AS computed
+            ON computed.team_id = stored.team_id
+        WHERE ({", ".join(f"stored.{c}" for c in COLUMNS)})
+            IS NOT ({", ".join(f"COALESCE(computed.{c}, 0)" for c in COLUMNS)})
+        ORDER BY stored.team_id
+        """
+    )
+    return [row[0] for row in cursor.fetchall()]
@@ -0,0 +1,221 @@
+"""background scrape jobs"""
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from copy import deepcopy
+from datetime import datetime
+from functools import partial
+from sqlite3 import Error
+from threading import Lock
+from time import perf_counter
+from uuid import uuid4
+from scraper.scraper import FootballScraper
+from scraper.parser import page_kind, page_league
+from cleaned_data.records import RecordPreprocessing
+from database.service import DatabaseManager
+from config import DB_PATH, JOB_HISTORY, URLS
+
+class JobConflict(Exception):
+    """a scrape is already running"""
+
+    def __init__(self, job_id: str | None) -> None:
+        super().__init__("A scrape is already running.")
+        self.job_id = job_id
+
+class JobManager:
+    """
+    run scrape jobs one at a time in the background and keep their status,
+    stored in the database too so that every api process can report it
+    """
+
+    def __init__(
+        self,
+        scraper: FootballScraper,
+        db_manager: DatabaseManager,
+        db: str = DB_PATH
+    ) -> None:
+        self.__scraper = scraper
+        self.__db_manager = db_manager
+        self.__db = db
+        self.__executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="scrape-job")
+        self.__jobs: OrderedDict[str, dict] = OrderedDict()
+        self.__lock = Lock()
+        self.__save_lock = Lock()
+        self.__active: str | None = None
+
+    def submit(self, incremental: bool = False, leagues: list[str] | None = None) -> dict:
+        """
+        start a scrape job for the given leagues (all by default), raising
+        ValueError for a league that has no url and JobConflict while another
+        scrape holds the database
+        """
+        unknown = set(leagues or []) - {page_league(url) for url in URLS}
+        if unknown:
+            raise ValueError(f"Unknown leagues {', '.join(sorted(unknown))}.")
+
+        urls = [url for url in URLS if leagues is None or page_league(url) in leagues]
+
+        with self.__lock:
+            if self.__active is not None:
+                raise JobConflict(self.__active)
+
+            job_id = uuid4().hex
+            if not self.__db_manager.acquire_scrape_lock(self.__db, job_id):
+                # another process is scraping, its job can be polled from here too
+                raise JobConflict(self.__db_manager.get_scrape_lock_holder(self.__db))
+
+            progress = {}
+            for url in urls:
+                progress.setdefault(page_league(url), {})[page_kind(url)] = {"status": "pending"}
+
+            self.__jobs[job_id] = {
+                "id": job_id,
+                "mode": "incremental" if incremental else "full",
+                "status": "queued",
+                "created_at": self.__now(),
+                "started_at": None,
+                "finished_at": None,
+                "timings": {},
+                "leagues": progress,
+                "message": None,
+                "error": None,
+            }
+            self.__active = job_id
+            self.__forget_old_jobs()
+
+            job = deepcopy(self.__jobs[job_id])
+
+        self.__save(job_id)
+        self.__executor.submit(self.__run, job_id, incremental, urls)
+
+        return job
+
+    def get(self, job_id: str) -> dict | None:
+        """get a copy of a job's status, or the stored status of another process's job"""
+        with self.__lock:
+            job = self.__jobs.get(job_id)
+            if job is not None:
+                return deepcopy(job)
+
+        return self.__db_manager.get_job(self.__db, job_id)
+
+    def shutdown(self) -> None:
+        """stop accepting jobs and drop the queued ones"""
+        self.__executor.shutdown(wait=False, cancel_futures=True)
+
+    def __run(self, job_id: str, incremental: bool, urls: list[str]) -> None:
+        """clean and save each league as soon as its pages are scraped"""
+        self.__update(job_id, status="running", started_at=self.__now())
+        started = perf_counter()
+        saved = 0
+        failed = 0
+
+        try:
+            scrape_state = self.__db_manager.get_scrape_state(self.__db) if incremental else {}
+
+            records = self.__scraper.start(
+                since={league: state[0] for league, state in scrape_state.items()},
+                progress=partial(self.__page_done, job_id),
+                urls=urls
+            )
+
+            if incremental:
+                cleaner, insert = RecordPreprocessing, self.__db_manager.insert_records
+            else:
+                # pandas is only loaded for full rebuilds
+                from cleaned_data.cleaner import Preprocessing
+                cleaner, insert = Preprocessing, self.__db_manager.insert_data
+
+            for clean_data in cleaner.per_league(records, scrape_state):
+                for league, error in clean_data.failed.items():
+                    self.__league_done(job_id, league, error=error)
+                    failed += 1
+
+                if not len(clean_data.results) and not len(clean_data.fixtures):
+                    continue
+
+                inserting = perf_counter()
+                changes = insert(
+                    self.__db,
+                    clean_data.results,
+                    clean_data.fixtures,
+                    clean_data.scrape_state
+                )
+
+                for league in clean_data.scrape_state:
+                    self.__league_done(
+                        job_id, league, insert=round(perf_counter() - inserting, 3), changes=changes
+                    )
+                    saved += 1
+
+            if failed:
+                status, message = "partial", f"{saved} leagues saved, {failed} failed."
+            elif saved:
+                status, message = "succeeded", "Data scraped and saved successfully!"
+            else:
+                status, message = "succeeded", "No new data to save."
+
+            self.__update(job_id, status=status, message=message)
+
+        except Exception as e:
+            self.__update(job_id, status="failed", error=str(e))
+
+        finally:
+            self.__db_manager.release_scrape_lock(self.__db, job_id)
+
+            with self.__lock:
+                self.__jobs[job_id]["timings"] = {"total": round(perf_counter() - started, 3)}
+                self.__jobs[job_id]["finished_at"] = self.__now()
+                self.__active = None
+
+            self.__save(job_id)
+
+    def __page_done(
+        self, job_id: str, url: str, seconds: float, rows: int, error: str | None
+    ) -> None:
+        """record one scraped page"""
+        with self.__lock:
+            self.__jobs[job_id]["leagues"][page_league(url)][page_kind(url)] = {
+                "status": "failed" if error else "done",
+                "seconds": round(seconds, 3),
+                "rows": rows,
+                "error": error,
+            }
+
+        self.__save(job_id)
+
+    def __league_done(self, job_id: str, league: str, **fields) -> None:
+        """record a league's cleaning/saving outcome"""
+        with self.__lock:
+            self.__jobs[job_id]["leagues"].setdefault(league, {}).update(fields)
+
+        self.__save(job_id)
+
+    def __update(self, job_id: str, **fields) -> None:
+        with self.__lock:
+            self.__jobs[job_id].update(fields)
+
+        self.__save(job_id)
+
+    def __save(self, job_id: str) -> None:
+        """
+        store the job's latest status, one save at a time so an older copy never
+        overwrites a newer one. a failed save only costs the other processes a progress update
+        """
+        with self.__save_lock:
+            with self.__lock:
+                job = deepcopy(self.__jobs[job_id])
+
+            try:
+                self.__db_manager.save_job(self.__db, job)
+            except Error as e:
+                print(f"Job status error: {e}")
+
+    def __forget_old_jobs(self) -> None:
+        while len(self.__jobs) > JOB_HISTORY:
+            oldest = next(iter(self.__jobs))
+            if oldest == self.__active:
+                break
+            self.__jobs.pop(oldest)
+
+    def __now(self) -> str:
+        return datetime.now().isoformat(timespec="seconds")
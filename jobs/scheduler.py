@@ -0,0 +1,84 @@
+"""periodic refresh scheduler"""
+from datetime import datetime, timedelta
+from sqlite3 import Error
+from threading import Event, Thread
+from scraper.parser import page_league
+from database.service import DatabaseManager
+from jobs.manager import JobConflict, JobManager
+from config import (
+    DB_PATH,
+    URLS,
+    SCHEDULER_TICK,
+    SCHEDULER_STAGGER,
+    MATCHDAY_INTERVAL,
+    IDLE_INTERVAL,
+    MATCH_LENGTH
+)
+
+class RefreshScheduler:
+    """refresh each league incrementally on its own cadence from a background thread"""
+
+    def __init__(
+        self,
+        job_manager: JobManager,
+        db_manager: DatabaseManager,
+        db: str = DB_PATH
+    ) -> None:
+        self.__job_manager = job_manager
+        self.__db_manager = db_manager
+        self.__db = db
+        self.__stop = Event()
+        self.__thread = Thread(target=self.__loop, name="refresh-scheduler", daemon=True)
+
+        now = datetime.now()
+        leagues = dict.fromkeys(page_league(url) for url in URLS)
+        self.__next_run = {
+            league: now + timedelta(seconds=SCHEDULER_STAGGER * position)
+            for position, league in enumerate(leagues)
+        }
+
+    def start(self) -> None:
+        """start the scheduler thread"""
+        self.__thread.start()
+
+    def stop(self) -> None:
+        """stop the scheduler thread"""
+        self.__stop.set()
+
+    def cadence(self, kickoffs: list[datetime], now: datetime) -> timedelta:
+        """
+        matchday interval while the league has a match today that has not
+        finished, otherwise the idle interval, cut short by the next kick-off
+        """
+        matchday = timedelta(seconds=MATCHDAY_INTERVAL)
+        match_length = timedelta(seconds=MATCH_LENGTH)
+
+        if any(k.date() == now.date() and k + match_length >= now for k in kickoffs):
+            return matchday
+
+        upcoming = [k - now for k in kickoffs if k > now]
+        return max(min([timedelta(seconds=IDLE_INTERVAL), *upcoming]), matchday)
+
+    def __loop(self) -> None:
+        while not self.__stop.wait(SCHEDULER_TICK):
+            self.__tick()
+
+    def __tick(self) -> None:
+        """submit one job for every league that is due"""
+        now = datetime.now()
+        due = [league for league, next_run in self.__next_run.items() if next_run <= now]
+
+        if not due:
+            return
+
+        try:
+            self.__job_manager.submit(incremental=True, leagues=due)
+            kickoffs = self.__db_manager.get_kickoffs(self.__db)
+        except JobConflict:
+            return
+        except Error as e:
+            print(f"Scheduler error: {e}")
+            return
+
+        for league in due:
+            self.__next_run[league] = now + self.cadence(kickoffs.get(league, []), now)
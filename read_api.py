@@ -0,0 +1,435 @@
+"""read-only api serving the stored leagues, with nothing heavier than flask and sqlite3"""
+
+import atexit
+from datetime import datetime
+from sqlite3 import Error
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from json import dumps, loads, JSONDecodeError
+from typing import Iterator
+from flask import Flask, Response, request
+from database.service import (
+    DatabaseManager,
+    BATCH_VIEWS,
+    MATCH_FIELDS,
+    RESULT_FIELDS,
+    FIXTURE_FIELDS
+)
+from cache.backends import RedisBackend
+from cache.response_cache import ResponseCache
+from serialization import standings_records, stream_json, stream_ndjson, view_records
+from config import DB_PATH, API_BP, FORM_MATCHES, CACHE_REDIS_URL
+
+# the tables are created and migrated by the process that scrapes
+db_manager = DatabaseManager(create_tables=False)
+atexit.register(db_manager.close)
+
+if CACHE_REDIS_URL:
+    from redis import Redis
+    response_cache = ResponseCache(db_manager, backend=RedisBackend(Redis.from_url(CACHE_REDIS_URL)))
+else:
+    response_cache = ResponseCache(db_manager)
+
+def error_response(error: Exception) -> Response:
+    """an error payload that is never cached"""
+    response = Response(dumps({"error": str(error)}), mimetype="application/json")
+    response.cache_control.no_store = True
+    return response
+
+def requested_season() -> str | None:
+    """the ?season= parameter, 2024-2025 and 2024/2025 both accepted"""
+    season = request.args.get("season")
+    return season.replace("-", "/") if season else None
+
+def requested_date(name: str = "date") -> str | None:
+    """a date parameter, in the dd-mm-yyyy format of the match dates"""
+    date = request.args.get(name)
+    return datetime.strptime(date, "%d-%m-%Y").strftime("%Y-%m-%d") if date else None
+
+def encode_cursor(key: tuple[str, int] | None) -> str | None:
+    """the opaque ?cursor= token of a (date, id) key"""
+    return urlsafe_b64encode(dumps(key).encode()).decode() if key else None
+
+def requested_number(name: str, default: int | None = None) -> int | None:
+    """a positive number parameter, raising ValueError for anything else"""
+    value = request.args.get(name)
+    if value is None:
+        return default
+
+    if not value.isdigit() or int(value) < 1:
+        raise ValueError(f"Invalid {name} {value}, expected a positive number.")
+
+    return int(value)
+
+def requested_limit() -> int | None:
+    """the ?limit= parameter, a positive number"""
+    return requested_number("limit")
+
+def requested_descending() -> bool:
+    """whether ?order=desc was asked for rather than the default asc"""
+    order = request.args.get("order", "asc")
+    if order not in ("asc", "desc"):
+        raise ValueError(f"Unknown order {order}, expected asc or desc.")
+
+    return order == "desc"
+
+def requested_page(fields: dict[str, str]) -> dict:
+    """the paging, date range and field parameters, raising ValueError for an invalid one"""
+    limit = requested_limit()
+    descending = requested_descending()
+
+    selected = request.args.get("fields")
+    selected = selected.split(",") if selected else None
+    unknown = set(selected or []) - fields.keys()
+    if unknown:
+        raise ValueError(f"Unknown fields {', '.join(sorted(unknown))}.")
+
+    cursor = request.args.get("cursor")
+    try:
+        after = tuple(loads(urlsafe_b64decode(cursor.encode()))) if cursor else None
+    except TypeError as e:
+        raise ValueError(f"Invalid cursor {cursor}.") from e
+
+    if after is not None and len(after) != 2:
+        raise ValueError(f"Invalid cursor {cursor}.")
+
+    return {
+        "fields": selected,
+        "limit": limit,
+        "descending": descending,
+        "date_from": requested_date("from"),
+        "date_to": requested_date("to"),
+        "after": after,
+    }
+
+def requested_stream() -> str | None:
+    """the ?stream= parameter, json or ndjson"""
+    stream = request.args.get("stream")
+    if stream not in (None, "json", "ndjson"):
+        raise ValueError(f"Unknown stream {stream}, expected json or ndjson.")
+
+    return stream
+
+def streamed_response(stream: str, head: dict, key: str, records: Iterator[dict]) -> Response:
+    """a response that serializes the records while they are read"""
+    if stream == "ndjson":
+        return Response(stream_ndjson(records), mimetype="application/x-ndjson")
+
+    return Response(stream_json(head, key, records), mimetype="application/json")
+
+def materialized_response(league_name: str, season: str | None, view: str) -> Response | None:
+    """
+    the response of a whole view, its materialized body spliced into the same
+    indented json the live query gives, or None when it is not materialized
+    """
+    stored = db_manager.get_view(league_name, view, DB_PATH, season)
+    if stored is None:
+        return None
+
+    head = dumps({"league": league_name, "season": stored[0]}, indent=2)
+    return Response(f'{head[:-2]},\n  "{view}": {stored[1]}\n}}', mimetype="application/json")
+
+def bad_request(error: Exception) -> Response:
+    """the error of an invalid parameter"""
+    return Response(dumps({"error": str(error)}), status=400, mimetype="application/json")
+
+@API_BP.route("/<league_name>/seasons", methods=["GET"])
+@response_cache.cached
+def get_seasons_data(league_name: str):
+    """get the stored seasons"""
+    try:
+        data = {
+            "league": league_name,
+            "seasons": db_manager.get_seasons(league_name, DB_PATH)
+        }
+
+        response_data = dumps(data, indent=2)
+    except Error as e:
+        return error_response(e)
+    return Response(response_data, mimetype="application/json")
+
+@API_BP.route("/<league_name>/teams", methods=["GET"])
+@response_cache.cached
+def get_teams_data(league_name: str):
+    """get teams data"""
+    season = requested_season()
+    try:
+        materialized = materialized_response(league_name, season, "teams")
+        if materialized is not None:
+            return materialized
+
+        teams = [
+            {"id": data[2], "name": data[1]}
+            for data in db_manager.get_teams(league_name, DB_PATH, season)
+        ]
+
+        data = {
+            "league": league_name,
+            "season": db_manager.get_season(league_name, season, DB_PATH),
+            "teams": teams
+        }
+
+        response_data = dumps(data, indent=2)
+    except Error as e:
+        return error_response(e)
+    except JSONDecodeError as e:
+        return error_response(e)
+    return Response(response_data, mimetype="application/json")
+
+@API_BP.route("/<league_name>/results", methods=["GET"])
+@response_cache.cached
+def get_results_data(league_name: str):
+    """
+    get results data, a page at a time with ?limit= and the returned
+    ?cursor=, newest first with ?order=desc, between ?from= and ?to= and
+    with only some ?fields=id,date,home,away. ?stream=json or ?stream=ndjson
+    sends the rows as they are read, in compact json or one object per line
+    """
+    season = requested_season()
+    try:
+        page = requested_page(RESULT_FIELDS)
+        fields = page["fields"] or list(RESULT_FIELDS)
+        stream = requested_stream()
+
+        materialized = None if stream or any(page.values()) else materialized_response(
+            league_name, season, "results"
+        )
+        if materialized is not None:
+            return materialized
+
+        if stream:
+            return streamed_response(
+                stream,
+                {
+                    "league": league_name,
+                    "season": db_manager.get_season(league_name, season, DB_PATH)
+                },
+                "results",
+                (
+                    dict(zip(fields, row))
+                    for row in db_manager.iter_results(league_name, DB_PATH, season, page)
+                )
+            )
+
+        rows, next_key = db_manager.get_results(league_name, DB_PATH, season, page)
+
+        data = {
+            "league": league_name,
+            "season": db_manager.get_season(league_name, season, DB_PATH),
+            "results": [dict(zip(fields, row)) for row in rows]
+        }
+
+        if page["limit"] is not None:
+            data["next_cursor"] = encode_cursor(next_key)
+
+        response_data = dumps(data, indent=2)
+    except ValueError as e:
+        return bad_request(e)
+    except Error as e:
+        return error_response(e)
+    return Response(response_data, mimetype="application/json")
+
+@API_BP.route("/<league_name>/fixtures", methods=["GET"])
+@response_cache.cached
+def get_fixtures_data(league_name: str):
+    """get fixtures data, with the same paging, date range, fields and streaming as results"""
+    season = requested_season()
+    try:
+        page = requested_page(FIXTURE_FIELDS)
+        fields = page["fields"] or list(FIXTURE_FIELDS)
+        stream = requested_stream()
+
+        materialized = None if stream or any(page.values()) else materialized_response(
+            league_name, season, "fixtures"
+        )
+        if materialized is not None:
+            return materialized
+
+        if stream:
+            return streamed_response(
+                stream,
+                {
+                    "league": league_name,
+                    "season": db_manager.get_season(league_name, season, DB_PATH)
+                },
+                "fixtures",
+                (
+                    dict(zip(fields, row))
+                    for row in db_manager.iter_fixtures(league_name, DB_PATH, season, page)
+                )
+            )
+
+        rows, next_key = db_manager.get_fixtures(league_name, DB_PATH, season, page)
+
+        data = {
+            "league": league_name,
+            "season": db_manager.get_season(league_name, season, DB_PATH),
+            "fixtures": [dict(zip(fields, row)) for row in rows]
+        }
+
+        if page["limit"] is not None:
+            data["next_cursor"] = encode_cursor(next_key)
+
+        response_data = dumps(data, indent=2)
+    except ValueError as e:
+        return bad_request(e)
+    except Error as e:
+        return error_response(e)
+    return Response(response_data, mimetype="application/json")
+
+@API_BP.route("/<league_name>/standings", methods=["GET"])
+@response_cache.cached
+def get_standings_data(league_name: str):
+    """
+    get standings data, or the standings as they were on a ?date=dd-mm-yyyy
+    or after each team's first ?matchday=n matches
+    """
+    season = requested_season()
+    try:
+        date = requested_date()
+        matchday = requested_number("matchday")
+
+        if date or matchday:
+            rows = db_manager.get_standings_table(
+                league_name, DB_PATH, season, date=date, matchday=matchday
+            )
+        else:
+            materialized = materialized_response(league_name, season, "standings")
+            if materialized is not None:
+                return materialized
+
+            rows = db_manager.get_standings(league_name, DB_PATH, season)
+
+        data = {
+            "league": league_name,
+            "season": db_manager.get_season(league_name, season, DB_PATH),
+            "standings": standings_records(rows)
+        }
+
+        response_data = dumps(data, indent=2)
+    except ValueError as e:
+        return bad_request(e)
+    except Error as e:
+        return error_response(e)
+    return Response(response_data, mimetype="application/json")
+
+@API_BP.route("/<league_name>/standings/<any(home, away):venue>", methods=["GET"])
+@response_cache.cached
+def get_venue_standings_data(league_name: str, venue: str):
+    """get the home-only or away-only table, with the same ?date= and ?matchday="""
+    season = requested_season()
+    try:
+        rows = db_manager.get_standings_table(
+            league_name,
+            DB_PATH,
+            season,
+            venue=venue,
+            date=requested_date(),
+            matchday=requested_number("matchday")
+        )
+
+        data = {
+            "league": league_name,
+            "season": db_manager.get_season(league_name, season, DB_PATH),
+            "venue": venue,
+            "standings": standings_records(rows)
+        }
+
+        response_data = dumps(data, indent=2)
+    except ValueError as e:
+        return bad_request(e)
+    except Error as e:
+        return error_response(e)
+    return Response(response_data, mimetype="application/json")
+
+@API_BP.route("/<league_name>/form", methods=["GET"])
+@response_cache.cached
+def get_form_data(league_name: str):
+    """
+    get every team's form over its ?last=5 matches, optionally only
+    ?venue=home or away and up to a ?date=dd-mm-yyyy
+    """
+    season = requested_season()
+    try:
+        venue = request.args.get("venue")
+        if venue not in (None, "home", "away"):
+            raise ValueError(f"Unknown venue {venue}, expected home or away.")
+
+        rows = db_manager.get_form(
+            league_name,
+            DB_PATH,
+            season,
+            last=requested_number("last", FORM_MATCHES),
+            venue=venue,
+            date=requested_date()
+        )
+
+        form = standings_records([(row[0], row[1], *row[3:]) for row in rows])
+        for record, row in zip(form, rows):
+            record["form"] = row[2]
+
+        data = {
+            "league": league_name,
+            "season": db_manager.get_season(league_name, season, DB_PATH),
+            "form": form
+        }
+
+        response_data = dumps(data, indent=2)
+    except ValueError as e:
+        return bad_request(e)
+    except Error as e:
+        return error_response(e)
+    return Response(response_data, mimetype="application/json")
+
+@API_BP.route("/batch", methods=["GET"])
+@response_cache.cached
+def get_batch_data():
+    """
+    get several ?views=standings,results,fixtures,teams of several
+    ?leagues=premier-league,serie-a in one response, read over one connection
+    with a query per view. ?season= applies to every league, and ?limit= with
+    ?order=desc keeps each league's first (or latest) results and fixtures
+    """
+    season = requested_season()
+    try:
+        leagues = request.args.get("leagues")
+        if not leagues:
+            raise ValueError("Missing leagues, expected e.g. ?leagues=premier-league,serie-a.")
+
+        views = request.args.get("views")
+        views = views.split(",") if views else list(BATCH_VIEWS)
+        unknown = set(views) - set(BATCH_VIEWS)
+        if unknown:
+            raise ValueError(f"Unknown views {', '.join(sorted(unknown))}.")
+
+        league_names = leagues.split(",")
+        batch = db_manager.get_batch(
+            league_names,
+            views,
+            DB_PATH,
+            season,
+            limit=requested_limit(),
+            descending=requested_descending()
+        )
+
+        data = {"leagues": []}
+        for league_name in league_names:
+            rows = batch[league_name.replace("-", " ")]
+            league = {"league": league_name, "season": rows["season"]}
+
+            for view in views:
+                league[view] = view_records(view, rows[view], list(MATCH_FIELDS.get(view, ())))
+
+            data["leagues"].append(league)
+
+        response_data = dumps(data, indent=2)
+    except ValueError as e:
+        return bad_request(e)
+    except Error as e:
+        return error_response(e)
+    return Response(response_data, mimetype="application/json")
+
+def create_app() -> Flask:
+    """an app serving only the read endpoints, for api workers that never scrape"""
+    app = Flask(__name__)
+    app.register_blueprint(API_BP)
+    return app
@@ -0,0 +1,57 @@
+"""replay saved snapshots through preprocessing and the database"""
+from argparse import ArgumentParser
+from pathlib import Path
+from time import perf_counter
+from scraper.scraper import FootballScraper
+from cleaned_data.cleaner import Preprocessing
+from cleaned_data.records import RecordPreprocessing
+from database.service import DatabaseManager
+from config import DB_PATH, SNAPSHOT_PATH
+
+def main():
+    """parse, clean and insert the snapshots, printing each stage's timing"""
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument("snapshots", nargs="?", type=Path, default=SNAPSHOT_PATH)
+    parser.add_argument("--db", type=Path, default=DB_PATH)
+    parser.add_argument(
+        "--verify",
+        action="store_true",
+        help="check the standings against a full recomputation and the materialized views against their live queries"
+    )
+    parser.add_argument(
+        "--records", action="store_true", help="clean into records instead of DataFrames"
+    )
+    args = parser.parse_args()
+
+    start = perf_counter()
+    raw_data = list(FootballScraper().start(replay_dir=args.snapshots))
+    parsed = perf_counter()
+
+    clean_data = (RecordPreprocessing if args.records else Preprocessing)(raw_data)
+    cleaned = perf_counter()
+
+    db_manager = DatabaseManager(args.db)
+    insert = db_manager.insert_records if args.records else db_manager.insert_data
+    changes = insert(
+        args.db,
+        clean_data.results,
+        clean_data.fixtures
+    )
+    inserted = perf_counter()
+
+    print(f"parse: {parsed - start:.3f}s")
+    print(f"preprocessing: {cleaned - parsed:.3f}s")
+    print(f"insert: {inserted - cleaned:.3f}s")
+
+    for table, counts in changes.items():
+        print(f"{table}: " + ", ".join(f"{count} {kind}" for kind, count in counts.items()))
+
+    if args.verify:
+        mismatches = db_manager.verify_standings(args.db)
+        print(f"standings: {len(mismatches)} rows differ from the results")
+
+        stale = db_manager.verify_views(args.db)
+        print(f"views: {len(stale)} differ from the live queries")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+'''driver pool'''
+import os
+from contextlib import contextmanager
+from queue import Empty, LifoQueue
+from threading import BoundedSemaphore, Lock
+from typing import Iterator
+from selenium.webdriver import ChromeOptions
+from selenium.webdriver.chrome.webdriver import WebDriver
+from selenium.common.exceptions import JavascriptException, WebDriverException
+from config import (
+    SCRAPER_WORKERS,
+    CHROME_MEMORY_MB,
+    DRIVER_MAX_USES,
+    PAGE_LOAD_TIMEOUT,
+    HEADERS
+)
+
+def worker_count() -> int:
+    '''SCRAPER_WORKERS, or as many sessions as the cpus and half of the ram can hold'''
+    if SCRAPER_WORKERS:
+        return SCRAPER_WORKERS
+
+    cpus = os.cpu_count() or 1
+
+    try:
+        memory_mb = os.sysconf('SC_PHYS_PAGES') * os.sysconf('SC_PAGE_SIZE') // 2**20
+    except (AttributeError, ValueError, OSError):
+        return cpus
+
+    return max(1, min(cpus, memory_mb // 2 // CHROME_MEMORY_MB))
+
+class DriverPool:
+    '''bounded pool of warm headless chrome sessions'''
+
+    def __init__(self, size: int | None = None, max_uses: int = DRIVER_MAX_USES) -> None:
+        size = size or worker_count()
+        self.__max_uses = max_uses
+        self.__idle: LifoQueue[WebDriver] = LifoQueue()
+        self.__slots = BoundedSemaphore(size)
+        self.__uses: dict[WebDriver, int] = {}
+        self.__lock = Lock()
+        self.__closed = False
+
+    def __create_driver(self) -> WebDriver:
+        '''start a new headless session'''
+        options = ChromeOptions()
+        options.add_argument('--headless=new')
+        options.add_argument('--disable-gpu')
+        options.add_argument('--window-size=1920,1080')
+        options.add_argument(f"--user-agent={HEADERS['User-Agent']}")
+        options.add_argument('--disable-dev-shm-usage')
+        options.add_argument('--disable-extensions')
+        options.add_argument('--renderer-process-limit=1')
+        options.add_argument(f'--js-flags=--max-old-space-size={CHROME_MEMORY_MB}')
+
+        driver = WebDriver(options=options)
+        driver.set_page_load_timeout(PAGE_LOAD_TIMEOUT)
+
+        with self.__lock:
+            self.__uses[driver] = 0
+
+        return driver
+
+    def __discard(self, driver: WebDriver) -> None:
+        '''quit a session and forget it'''
+        with self.__lock:
+            self.__uses.pop(driver, None)
+
+        try:
+            driver.quit()
+        except WebDriverException:
+            pass
+
+    def __reset(self, driver: WebDriver) -> None:
+        '''clear cookies, storage and consent state left by the previous page'''
+        try:
+            driver.execute_script('window.localStorage.clear(); window.sessionStorage.clear();')
+        except JavascriptException:
+            pass
+
+        driver.delete_all_cookies()
+        driver.get('about:blank')
+
+    def acquire(self) -> WebDriver:
+        '''take an idle session or start one if the pool is not full'''
+        self.__slots.acquire()
+
+        try:
+            return self.__idle.get_nowait()
+        except Empty:
+            pass
+
+        try:
+            return self.__create_driver()
+        except WebDriverException:
+            self.__slots.release()
+            raise
+
+    def release(self, driver: WebDriver, broken: bool = False) -> None:
+        '''give a session back, recycling it after max uses or a crash'''
+        try:
+            with self.__lock:
+                self.__uses[driver] = self.__uses.get(driver, 0) + 1
+                worn_out = self.__uses[driver] >= self.__max_uses
+
+            if broken or worn_out or self.__closed:
+                self.__discard(driver)
+                return
+
+            try:
+                self.__reset(driver)
+            except WebDriverException:
+                self.__discard(driver)
+                return
+
+            self.__idle.put(driver)
+        finally:
+            self.__slots.release()
+
+    @contextmanager
+    def session(self) -> Iterator[WebDriver]:
+        '''borrow a session for one page'''
+        driver = self.acquire()
+        broken = False
+
+        try:
+            yield driver
+        except WebDriverException:
+            broken = True
+            raise
+        finally:
+            self.release(driver, broken)
+
+    def close(self) -> None:
+        '''quit every idle session'''
+        self.__closed = True
+
+        while True:
+            try:
+                driver = self.__idle.get_nowait()
+            except Empty:
+                break
+
+            self.__discard(driver)
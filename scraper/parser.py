@@ -0,0 +1,169 @@
+'''single pass page parser'''
+from datetime import date, timedelta
+from html.parser import HTMLParser
+from pathlib import Path
+
+VOID_ELEMENTS = {
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input',
+    'link', 'meta', 'param', 'source', 'track', 'wbr'
+}
+
+# fixtures still listed up to this long after their date are late or awaiting a result
+FIXTURE_ROLLOVER_DAYS = 183
+
+FIELDS = {
+    'event__time': 'schedules',
+    'lineThrough': 'postponed',
+    'event__homeParticipant': 'home',
+    'event__awayParticipant': 'away',
+    'event__score--home': 'home_scores',
+    'event__score--away': 'away_scores',
+    'heading__name': 'league',
+    'heading__info': 'season',
+}
+
+ROW_CLASS = 'event__match'
+
+class PageParser(HTMLParser):
+    '''collect every match row of a rendered results/fixtures page'''
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.rows: list[dict[str, str]] = []
+        self.heading: dict[str, str] = {}
+        self.__stack: list[tuple[str, str | None]] = []
+        self.__buffers: dict[str, list[str]] = {}
+        self.__row: dict[str, str] | None = None
+
+    def handle_starttag(self, tag: str, attrs: list[tuple[str, str | None]]) -> None:
+        attributes = dict(attrs)
+        classes = (attributes.get('class') or '').split()
+
+        if tag in VOID_ELEMENTS:
+            self.__handle_void(tag, attributes)
+            return
+
+        field = None
+        if ROW_CLASS in classes and self.__row is None:
+            self.__row = {}
+            field = ROW_CLASS
+        else:
+            for name in classes:
+                if name in FIELDS:
+                    field = FIELDS[name]
+                    self.__buffers[field] = []
+                    break
+
+        self.__stack.append((tag, field))
+
+    def handle_startendtag(self, tag: str, attrs: list[tuple[str, str | None]]) -> None:
+        if tag in VOID_ELEMENTS:
+            self.__handle_void(tag, dict(attrs))
+        else:
+            self.handle_starttag(tag, attrs)
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag not in (open_tag for open_tag, _ in self.__stack):
+            return
+
+        while self.__stack:
+            open_tag, field = self.__stack.pop()
+            self.__close(field)
+
+            if open_tag == tag:
+                break
+
+    def handle_data(self, data: str) -> None:
+        for buffer in self.__buffers.values():
+            buffer.append(data)
+
+    def __handle_void(self, tag: str, attributes: dict[str, str | None]) -> None:
+        if tag != 'img' or self.__row is None:
+            return
+
+        for field in ('home', 'away'):
+            if field in self.__buffers and field not in self.__row:
+                self.__row[field] = (attributes.get('alt') or '').lower()
+
+    def __close(self, field: str | None) -> None:
+        if field is None:
+            return
+
+        if field == ROW_CLASS:
+            self.rows.append(self.__row)
+            self.__row = None
+            return
+
+        text = ' '.join(''.join(self.__buffers.pop(field, [])).split())
+
+        if field in ('home', 'away'):
+            # a participant without a logo falls back to its text, lowercased like the alt
+            text = text.lower()
+
+        if field in ('league', 'season'):
+            self.heading.setdefault(field, text)
+        elif self.__row is not None:
+            self.__row.setdefault(field, text)
+
+def parse_page(html: str) -> dict[str, list[str]]:
+    '''parse a rendered page into the scraped data shape'''
+    parser = PageParser()
+    parser.feed(html)
+    parser.close()
+
+    rows = parser.rows
+    league = parser.heading.get('league')
+    season = parser.heading.get('season')
+
+    return {
+        'league': [league.lower()] if league is not None else [],
+        'season': [season] * len(rows) if season is not None else [],
+        'schedules': [row.get('postponed', row.get('schedules', '')) for row in rows],
+        'match_status': [
+            'postponed' if 'postponed' in row else 'not_postponed' for row in rows
+        ],
+        'home': [row.get('home', '') for row in rows],
+        'away': [row.get('away', '') for row in rows],
+        'home_scores': [row.get('home_scores', '') for row in rows],
+        'away_scores': [row.get('away_scores', '') for row in rows],
+    }
+
+def snapshot_name(url: str) -> str:
+    '''file name of the snapshot saved for a url'''
+    return '_'.join(url.rstrip('/').split('/')[-3:]) + '.html'
+
+def parse_snapshot(path: Path) -> dict[str, list[str]]:
+    '''parse a saved results/fixtures snapshot'''
+    return parse_page(Path(path).read_text(encoding='utf-8'))
+
+def page_kind(url: str) -> str:
+    '''results or fixtures'''
+    return url.rstrip('/').split('/')[-1]
+
+def page_league(url: str) -> str:
+    '''league name of a results/fixtures url, as stored in the database'''
+    return url.rstrip('/').split('/')[-2].replace('-', ' ')
+
+def schedule_date(
+    schedule: str, is_results: bool, today: date | None = None, postponed: bool = False
+) -> date:
+    '''
+    date of a "dd.mm. HH:MM" schedule, inferring the year like Preprocessing:
+    results after today were last year's, and fixtures more than
+    FIXTURE_ROLLOVER_DAYS ago are next year's unless they were postponed
+    '''
+    today = today or date.today()
+    day, month = map(int, schedule.split(' ')[0].removesuffix('.').split('.')[:2])
+
+    match_date = date(today.year, month, day)
+    if is_results and match_date > today:
+        match_date = date(today.year - 1, month, day)
+    elif (
+        not is_results
+        and not postponed
+        and match_date < today - timedelta(days=FIXTURE_ROLLOVER_DAYS)
+    ):
+        match_date = date(today.year + 1, month, day)
+
+    return match_date
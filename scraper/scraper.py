@@ -1,189 +1,241 @@
 '''scraper'''
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import (
+    BrokenExecutor,
+    Executor,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    as_completed
+)
+from datetime import date
+from multiprocessing import get_context
+from multiprocessing.util import Finalize
+from pathlib import Path
+from time import perf_counter
+from typing import Callable, Iterator
 from selenium.webdriver.chrome.webdriver import WebDriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import NoSuchElementException, TimeoutException
-from config import URLS
+from selenium.common.exceptions import (
+    NoSuchElementException,
+    StaleElementReferenceException,
+    TimeoutException,
+    WebDriverException
+)
+from config import (
+    URLS,
+    SCRAPER_BACKEND,
+    PAGE_TIMEOUT,
+    URL_TIMEOUT,
+    SHOW_MORE_GRACE,
+    POLL_FREQUENCY
+)
+from scraper.driver_pool import DriverPool, worker_count
+from scraper.parser import (
+    page_kind,
+    page_league,
+    parse_page,
+    parse_snapshot,
+    schedule_date,
+    snapshot_name
+)
+
+ROW_COUNT_SCRIPT = "return document.getElementsByClassName('event__match').length;"
+
+ROW_STATE_SCRIPT = '''
+const rows = document.getElementsByClassName('event__match');
+const last = rows.length ? rows[rows.length - 1].querySelector('.event__time') : null;
+return [rows.length, last ? last.textContent : null];
+'''
 
 class FootballScraper:
     '''Football Scraper'''
-    def __render_pages(self, url: str):
-        '''render'''
-        driver = WebDriver()
+    def __init__(
+        self,
+        pool: DriverPool | None = None,
+        record_dir: Path | None = None,
+        backend: str = SCRAPER_BACKEND,
+        workers: int | None = None
+    ) -> None:
+        self.__workers = workers or worker_count()
+        self.__pool = pool or DriverPool(self.__workers)
+        self.__record_dir = record_dir
+        self.__backend = backend
+
+    def __render_pages(self, driver: WebDriver, url: str, cutoff: date | None = None) -> WebDriver:
+        '''render, clicking "show more" until every row (or the cutoff) is loaded'''
+        deadline = perf_counter() + URL_TIMEOUT
         driver.get(url)
 
-        wait = WebDriverWait(
-            driver,
-            timeout=20,
-            poll_frequency=5,
-            ignored_exceptions=[NoSuchElementException]
-        )
-
         try:
-            reject_btn_privacy = wait.until(
-                EC.element_to_be_clickable((By.ID, 'onetrust-reject-all-handler'))
+            self.__wait(driver, PAGE_TIMEOUT).until(
+                lambda d: d.find_elements(By.CLASS_NAME, 'event__match')
             )
+        except TimeoutException:
+            return driver
 
-            reject_btn_privacy.click()
+        for reject_btn_privacy in driver.find_elements(By.ID, 'onetrust-reject-all-handler'):
+            driver.execute_script('arguments[0].click();', reject_btn_privacy)
 
-        except TimeoutException:
-            pass
+        is_results = page_kind(url) == 'results'
 
         while True:
+            if perf_counter() > deadline:
+                raise TimeoutException(f'{url} took longer than {URL_TIMEOUT} seconds')
+
+            row_count, last_schedule = driver.execute_script(ROW_STATE_SCRIPT)
+
+            if cutoff is not None and is_results and last_schedule:
+                try:
+                    if schedule_date(last_schedule, is_results) < cutoff:
+                        break
+                except ValueError:
+                    pass
+
             try:
-                show_more_button = wait.until(
+                show_more_button = self.__wait(driver, SHOW_MORE_GRACE).until(
                     EC.element_to_be_clickable((By.CLASS_NAME, 'event__more'))
                 )
 
-                show_more_button.click()
+                driver.execute_script('arguments[0].click();', show_more_button)
 
-                wait.until(
-                    EC.visibility_of_all_elements_located((By.CLASS_NAME, 'event__time'))
+                self.__wait(driver, PAGE_TIMEOUT).until(
+                    lambda d, count=row_count: d.execute_script(ROW_COUNT_SCRIPT) > count
                 )
 
+            except StaleElementReferenceException:
+                continue
             except TimeoutException:
                 break
 
         return driver
 
+    def __wait(self, driver: WebDriver, timeout: float) -> WebDriverWait:
+        '''a wait that polls at a fine interval'''
+        return WebDriverWait(
+            driver,
+            timeout=timeout,
+            poll_frequency=POLL_FREQUENCY,
+            ignored_exceptions=[NoSuchElementException]
+        )
 
-    def __get_match_schedules(self: 'FootballScraper', driver: WebDriver) -> list[str] | list:
-        '''get match schedules'''
-        match_schedules = []
-
-        try:
-            match_schedules_elements = driver.find_elements(By.CLASS_NAME, 'event__time')
-        except NoSuchElementException:
-            return match_schedules
-
-        for element in match_schedules_elements:
-            try:
-
-                postponed = element.find_element(By.CLASS_NAME, 'lineThrough')
-                match_schedules.append(postponed.text)
-
-            except NoSuchElementException:
-                match_schedules.append(element.text)
-
-        return match_schedules
-
-    def __match_status(self, driver: WebDriver) -> list[bool] | list:
-        match_status = []
+    def scrape_page(
+        self, url: str, cutoff: date | None = None
+    ) -> tuple[dict[str, list[str]] | None, float, str | None]:
+        '''render and parse one page, returning (data, seconds, error)'''
+        started = perf_counter()
 
         try:
-            match_schedules_elements = driver.find_elements(By.CLASS_NAME, 'event__time')
-        except NoSuchElementException:
-            return match_status
-
-        for element in match_schedules_elements:
-
-            try:
-
-                element.find_element(By.CLASS_NAME, 'lineThrough')
-                match_status.append("postponed")
-
-            except NoSuchElementException:
-                match_status.append("not_postponed")
-
-        return match_status
-
-    def __get_home_clubs(self, driver: WebDriver) -> list[str] | list:
+            with self.__pool.session() as driver:
+                driver = self.__render_pages(driver, url, cutoff)
+                page_source = driver.page_source
+        except WebDriverException as e:
+            return None, perf_counter() - started, str(e)
+
+        if self.__record_dir is not None:
+            self.__record(url, page_source)
+
+        return parse_page(page_source), perf_counter() - started, None
+
+    def __record(self, url: str, page_source: str) -> None:
+        '''save the rendered page as a snapshot'''
+        self.__record_dir.mkdir(parents=True, exist_ok=True)
+        path = self.__record_dir / snapshot_name(url)
+        path.write_text(page_source, encoding='utf-8')
+
+    def start(
+        self,
+        replay_dir: Path | None = None,
+        since: dict[str, str] | None = None,
+        progress: Callable[[str, float, int, str | None], None] | None = None,
+        urls: list[str] | None = None
+    ) -> Iterator[dict]:
         '''
-        fetch match results
+        to start scraping, or replay saved snapshots when replay_dir is given.
+        yields a {league, kind, url, data, error} record per page as soon as
+        it completes. since maps a league to the ISO date of its last saved
+        result, results pages stop loading once they are older than it.
+        progress is called after every page. urls defaults to every url in config
         '''
-        home_participants = []
-
-        try:
-            div_home_participants = driver.find_elements(By.CLASS_NAME, 'event__homeParticipant')
-
-            for home_participant in div_home_participants:
-
-                img_tag_home = home_participant.find_element(By.TAG_NAME, 'img')
+        urls = URLS if urls is None else urls
 
-                home_participants.append(img_tag_home.get_attribute('alt').lower())
-        except NoSuchElementException:
-            pass
+        if replay_dir is not None:
+            for url in urls:
+                yield self.__tag(url, parse_snapshot(Path(replay_dir) / snapshot_name(url)))
+            return
 
-        return home_participants
+        since = since or {}
 
-    def __get_away_clubs(self, driver: WebDriver) -> list[str]:
-        away_participants = []
-        try:
-            div_away_participants = driver.find_elements(By.CLASS_NAME, 'event__awayParticipant')
+        with self.__executor() as executor:
+            futures = {}
+            for url in urls:
+                league = page_league(url)
+                cutoff = None
+                if page_kind(url) == 'results' and since.get(league):
+                    cutoff = date.fromisoformat(since[league])
 
-            for away_participant in div_away_participants:
-                img_tag_away = away_participant.find_element(By.TAG_NAME, 'img')
-                away_participants.append(img_tag_away.get_attribute('alt').lower())
-        except NoSuchElementException:
-            pass
+                if self.__backend == 'process':
+                    future = executor.submit(_scrape_in_worker, url, cutoff)
+                else:
+                    future = executor.submit(self.scrape_page, url, cutoff)
 
-        return away_participants
+                futures[future] = url
 
+            for future in as_completed(futures):
+                url = futures[future]
 
-    def __get_home_scores(self, driver: WebDriver) -> list[str] | list:
-        try:
-            home_scores_elements = driver.find_elements(By.CLASS_NAME, 'event__score--home')
-            home_scores = [score.text for score in home_scores_elements]
-            return home_scores
-        except NoSuchElementException:
-            return []
+                try:
+                    scraped_data, seconds, error = future.result()
+                except BrokenExecutor as e:
+                    scraped_data, seconds, error = None, 0.0, str(e) or 'scraper worker crashed'
 
-    def __get_away_scores(self, driver: WebDriver) -> list[str] | list:
-        try:
-            away_scores_elements = driver.find_elements(By.CLASS_NAME, 'event__score--away')
+                if progress is not None:
+                    rows = len(scraped_data['schedules']) if scraped_data else 0
+                    progress(url, seconds, rows, error)
 
-            away_scores = [score.text for score in away_scores_elements]
+                yield self.__tag(url, scraped_data, error)
 
-            return away_scores
-        except NoSuchElementException:
-            return []
-
-    def __get_league_name(self, driver: WebDriver) -> list[str] | list:
-        try:
-            league_name = driver.find_element(By.CLASS_NAME, 'heading__name').text
-            return [league_name.lower()]
-        except NoSuchElementException:
-            return []
+    def __executor(self) -> Executor:
+        '''
+        threads sharing the warm driver pool, or processes that each keep
+        one session warm for the rest of the run
+        '''
+        if self.__backend == 'process':
+            return ProcessPoolExecutor(
+                max_workers=self.__workers,
+                mp_context=get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(self.__record_dir,)
+            )
 
-    def __get_seasson(self, driver: WebDriver, len_of_data: int) -> list[str]:
-        try:
-            season = [driver.find_element(By.CLASS_NAME, 'heading__info').text]
-            return season * len_of_data
-        except NoSuchElementException:
-            return []
-
-    def __scraping(self, url: str) -> dict[str, list[str]]:
-        '''scrap the data'''
-        driver = self.__render_pages(url)
-
-        match_schedules = self.__get_match_schedules(driver)
-        is_postponed = self.__match_status(driver)
-        league_name = self.__get_league_name(driver)
-        season = self.__get_seasson(driver, len(match_schedules))
-        home_clubs = self.__get_home_clubs(driver)
-        away_clubs = self.__get_away_clubs(driver)
-        home_scores = self.__get_home_scores(driver)
-        away_scores = self.__get_away_scores(driver)
-
-        scraped_data = {
-            'league': league_name,
-            'season': season,
-            'schedules': match_schedules,
-            'match_status': is_postponed,
-            'home': home_clubs,
-            'away': away_clubs,
-            'home_scores': home_scores, 
-            'away_scores': away_scores 
+        return ThreadPoolExecutor(max_workers=self.__workers)
+
+    def __tag(
+        self, url: str, scraped_data: dict[str, list[str]] | None, error: str | None = None
+    ) -> dict:
+        '''label a page's data with its league and kind'''
+        return {
+            'league': page_league(url),
+            'kind': page_kind(url),
+            'url': url,
+            'data': scraped_data,
+            'error': error,
         }
 
-        driver.quit()
-        return scraped_data
+    def close(self) -> None:
+        '''shut down the warm browser sessions'''
+        self.__pool.close()
+
+_worker_scraper: FootballScraper | None = None
 
-    def start(self):
-        '''to start scraping'''
-        with ThreadPoolExecutor(max_workers=3) as executor:
-            raw_data = executor.map(self.__scraping, URLS)
+def _init_worker(record_dir: Path | None) -> None:
+    '''give a scraper process its own single-session scraper'''
+    global _worker_scraper
+    _worker_scraper = FootballScraper(DriverPool(1), record_dir, backend='thread', workers=1)
+    Finalize(_worker_scraper, _worker_scraper.close, exitpriority=10)
 
-        return raw_data
+def _scrape_in_worker(
+    url: str, cutoff: date | None
+) -> tuple[dict[str, list[str]] | None, float, str | None]:
+    '''scrape one page in a scraper process'''
+    return _worker_scraper.scrape_page(url, cutoff)
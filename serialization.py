@@ -0,0 +1,83 @@
+"""json serialization of the served records: compact, streamed or indented"""
+import json
+from itertools import islice
+from typing import Iterable, Iterator, Sequence
+from config import JSON_BACKEND, STREAM_BATCH_SIZE
+
+if JSON_BACKEND == "orjson":
+    try:
+        import orjson
+    except ImportError:
+        orjson = None
+else:
+    orjson = None
+
+def dumps(obj) -> bytes:
+    """serialize to compact json bytes, with orjson when it is the configured backend"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+
+    return json.dumps(obj, separators=(",", ":")).encode()
+
+def _batches(records: Iterable[dict]) -> Iterator[list[dict]]:
+    records = iter(records)
+    while batch := list(islice(records, STREAM_BATCH_SIZE)):
+        yield batch
+
+def stream_json(head: dict, key: str, records: Iterable[dict]) -> Iterator[bytes]:
+    """stream {**head, key: [records]} a batch of records at a time"""
+    yield dumps(head)[:-1] + (b"," if head else b"") + dumps(key) + b":["
+
+    separator = b""
+    for batch in _batches(records):
+        yield separator + b",".join(dumps(record) for record in batch)
+        separator = b","
+
+    yield b"]}"
+
+def stream_ndjson(records: Iterable[dict]) -> Iterator[bytes]:
+    """stream one json record per line, a batch of records at a time"""
+    for batch in _batches(records):
+        yield b"".join(dumps(record) + b"\n" for record in batch)
+
+def standings_records(rows: list[tuple]) -> list[dict]:
+    """standings rows (id, team, MP, W, D, L, GF, GA, GD, PTS) as ranked records"""
+    standings = []
+    position = 1
+    for data in rows:
+        record = {
+            "id": data[0],
+            "team": data[1],
+            "match_played": data[2],
+            "won": data[3],
+            "drawn": data[4],
+            "loses": data[5],
+            "goals_for": data[6],
+            "goals_against": data[7],
+            "goals_difference": data[8],
+            "points": data[9],
+            "position": position
+        }
+
+        position += 1
+
+        standings.append(record)
+
+    return standings
+
+def view_records(view: str, rows: list[tuple], fields: Sequence[str] = ()) -> list[dict]:
+    """
+    the records an endpoint serves for the rows of a view: ranked standings,
+    teams from (team_id, name) and results or fixtures keyed by their fields
+    """
+    if view == "standings":
+        return standings_records(rows)
+
+    if view == "teams":
+        return [{"id": row[0], "name": row[1]} for row in rows]
+
+    return [dict(zip(fields, row)) for row in rows]
+
+def indented(obj) -> str:
+    """obj as the indent=2 json of a value nested one level in a response"""
+    return json.dumps(obj, indent=2).replace("\n", "\n  ")
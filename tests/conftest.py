@@ -0,0 +1,12 @@
+"""point every module that reads config.DB_PATH at a temporary database"""
+from pathlib import Path
+from shutil import rmtree
+from tempfile import mkdtemp
+import config as settings
+
+def pytest_configure():
+    # before any test module imports the api, which reads the path when it is imported
+    settings.DB_PATH = Path(mkdtemp(prefix="football-")) / "football.db"
+
+def pytest_unconfigure():
+    rmtree(settings.DB_PATH.parent, ignore_errors=True)
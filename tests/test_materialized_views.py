@@ -0,0 +1,87 @@
+"""the endpoints serve every materialized view exactly as its live query, whichever loader stored it"""
+import sqlite3
+import pytest
+import config
+import read_api
+from cleaned_data.benchmark import synthetic_records
+from cleaned_data.cleaner import Preprocessing
+from cleaned_data.records import RecordPreprocessing
+from database.service import BATCH_VIEWS, DatabaseManager
+
+LEAGUES = 3
+SEASONS = ["2000-2001", "2001-2002"]
+
+def _records(loader: str) -> list[dict]:
+    """synthetic pages whose leagues are named after the loader that stores them"""
+    records = synthetic_records(LEAGUES, len(SEASONS), 60)
+    for record in records:
+        record["league"] = f"{loader} {record['league']}"
+        record["data"]["league"] = [f"{loader} {name}" for name in record["data"]["league"]]
+
+    return records
+
+def _bodies(client, urls: list[str]) -> dict[str, bytes]:
+    bodies = {}
+    for url in urls:
+        response = client.get(url)
+        assert response.status_code == 200, url
+        bodies[url] = response.get_data()
+
+    return bodies
+
+@pytest.fixture(scope="module")
+def client():
+    """the read-only app over leagues loaded from frames and from records"""
+    db_manager = DatabaseManager(config.DB_PATH)
+
+    frames = Preprocessing(_records("frames"))
+    db_manager.insert_data(config.DB_PATH, frames.results, frames.fixtures)
+
+    records = RecordPreprocessing(_records("records"))
+    db_manager.insert_records(config.DB_PATH, records.results, records.fixtures)
+
+    yield read_api.create_app().test_client()
+
+    db_manager.close()
+    read_api.db_manager.close()
+
+@pytest.mark.parametrize("loader", ["frames", "records"])
+def test_materialized_views_match_live_queries(client, loader):
+    leagues = [f"{loader}-league-{league}" for league in range(LEAGUES)]
+    urls = [
+        f"/api/{league}/{view}{query}"
+        for league in leagues
+        for view in BATCH_VIEWS
+        for query in ["", *(f"?season={season}" for season in SEASONS)]
+    ]
+
+    def stored_views() -> list:
+        return [
+            read_api.db_manager.get_view(league, view, config.DB_PATH, season.replace("-", "/"))
+            for league in leagues
+            for view in BATCH_VIEWS
+            for season in SEASONS
+        ]
+
+    assert None not in stored_views()
+    materialized = _bodies(client, urls)
+
+    conn = sqlite3.connect(config.DB_PATH)
+    with conn:
+        conn.execute(
+            """
+            DELETE FROM materialized_views WHERE league_id IN (
+                SELECT league_id FROM leagues WHERE name LIKE ?
+            )
+            """,
+            (f"{loader} %",),
+        )
+        # a new data version, so that no cached response is served
+        conn.execute("UPDATE data_version SET version = version + 1")
+    conn.close()
+
+    assert set(stored_views()) == {None}
+    live = _bodies(client, urls)
+
+    assert b'"home_score"' in live[f"/api/{leagues[0]}/results"]
+    assert materialized == live